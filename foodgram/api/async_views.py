@@ -0,0 +1,294 @@
+from collections import defaultdict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+from .autocomplete import ingredient_index
+from .fragments import get_user_fields, recipe_fragments
+from .membership import get_membership
+from .replicas import atomic_requests, use_database
+from .snapshots import ingredients_payload, tags_payload
+
+
+def async_read(sync_view, handler):
+    """Асинхронное представление для GET запросов к viewset DRF.
+
+    Аутентификация, права и согласование формата выполняются самим
+    viewset, данные загружаются асинхронным ORM. Если handler
+    возвращает None (ошибка, курсорная пагинация, нестандартный формат
+    ответа), а также для остальных методов запрос передается исходному
+    синхронному представлению, поэтому поведение и ответы не меняются.
+    """
+
+    viewset = sync_view.cls
+    actions = {'head': sync_view.actions['get'], **sync_view.actions}
+
+    def sync_handler(request, *args, **kwargs):
+        with atomic_requests(sync_view):
+            return sync_view(request, *args, **kwargs)
+
+    async def read(request, *args, **kwargs):
+        with use_database(None):
+            return await read_data(request, *args, **kwargs)
+
+    async def read_data(request, *args, **kwargs):
+        view = viewset(**sync_view.initkwargs)
+        view.action_map = actions
+        for method, action in actions.items():
+            setattr(view, method, getattr(view, action))
+        view.args, view.kwargs = args, kwargs
+        view.request = drf_request = view.initialize_request(
+            request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        try:
+            await sync_to_async(view.initial)(drf_request)
+        except APIException:
+            return None
+        if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+            return None
+
+        data = await handler(view, drf_request, *args, **kwargs)
+        if data is None:
+            return None
+        if isinstance(data, HttpResponseBase):
+            response = data
+        else:
+            renderer = drf_request.accepted_renderer
+            response = HttpResponse(
+                renderer.render(data, drf_request.accepted_media_type,
+                                view.get_renderer_context()),
+                content_type=renderer.media_type
+            )
+        return view.finalize_response(drf_request, response)
+
+    @transaction.non_atomic_requests
+    @wraps(sync_view)
+    async def async_view(request, *args, **kwargs):
+        if request.method == 'GET' and 'format' not in kwargs:
+            response = await read(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_to_async(sync_handler)(request, *args, **kwargs)
+
+    return async_view
+
+
+def build_image_url(request, name):
+    if not name:
+        return None
+    return request.build_absolute_uri(
+        Recipe._meta.get_field('image').storage.url(name))
+
+
+def brief_recipe(recipe, request):
+    """Представление рецепта как в BriefRecipeSerializer."""
+
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'image': build_image_url(request, recipe.image.name),
+        'image_thumb': build_image_url(
+            request, recipe.image_variants.get('thumb') or recipe.image.name),
+        'image_variants': {
+            variant: build_image_url(request, name)
+            for variant, name in recipe.image_variants.items()
+            if variant != 'source'
+        },
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def user_fields(user, is_subscribed):
+    return {
+        'email': user.email,
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': is_subscribed,
+    }
+
+
+async def build_recipes(recipes, request):
+    """Загружает теги и ингредиенты рецептов двумя запросами и
+       возвращает их в виде RecipeReadSerializer."""
+
+    ids = [recipe.id for recipe in recipes]
+    tags = defaultdict(list)
+    async for recipe_tag in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids).select_related('tag').order_by('tag__name'):
+        tag = recipe_tag.tag
+        tags[recipe_tag.recipe_id].append({
+            'id': tag.id, 'name': tag.name, 'color': tag.color,
+            'slug': tag.slug,
+        })
+    ingredients = defaultdict(list)
+    async for amount in IngredientAmount.objects.filter(
+            recipe_id__in=ids).select_related('ingredient'):
+        ingredients[amount.recipe_id].append({
+            'id': amount.ingredient.id,
+            'name': amount.ingredient.name,
+            'measurement_unit': amount.ingredient.units,
+            'amount': amount.amount,
+        })
+
+    membership = get_membership(request)
+    result = []
+    for recipe in recipes:
+        brief = brief_recipe(recipe, request)
+        is_favorited, is_in_shopping_cart, is_subscribed = get_user_fields(
+            recipe, membership)
+        result.append({
+            'id': recipe.id,
+            'image_thumb': brief['image_thumb'],
+            'image_variants': brief['image_variants'],
+            'is_favorited': is_favorited,
+            'is_in_shopping_cart': is_in_shopping_cart,
+            'tags': tags[recipe.id],
+            'ingredients': ingredients[recipe.id],
+            'author': user_fields(recipe.author, is_subscribed),
+            'image': brief['image'],
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        })
+    return result
+
+
+async def load_recipes(queryset, request):
+    """Загружает рецепты и возвращает их в виде RecipeReadSerializer.
+
+    Теги и ингредиенты загружаются только для рецептов, которых нет в
+    кэше фрагментов.
+    """
+
+    recipes = [recipe async for recipe in queryset]
+    if not recipes:
+        return []
+
+    async def build(missing):
+        return await build_recipes(missing, request)
+
+    return await recipe_fragments.aserialize(recipes, request, build)
+
+
+async def recipe_list(view, request):
+    if view.paginator.cursor_query_param in request.query_params:
+        return None
+
+    def get_queryset():
+        return view.filter_queryset(view.get_queryset())
+
+    try:
+        queryset = await sync_to_async(get_queryset)()
+        page = await view.paginator.apaginate_queryset(
+            queryset.prefetch_related(None), request)
+    except (APIException, InvalidPage):
+        return None
+    return view.paginator.get_paginated_response(
+        await load_recipes(page, request)).data
+
+
+async def recipe_detail(view, request, pk):
+    if request.query_params:
+        return None
+    queryset = await sync_to_async(view.get_queryset)()
+    try:
+        recipes = await load_recipes(
+            queryset.prefetch_related(None).filter(pk=pk), request)
+    except (TypeError, ValueError):
+        return None
+    return recipes[0] if recipes else None
+
+
+async def tag_list(view, request):
+    return await tags_payload.aresponse(request)
+
+
+async def tag_detail(view, request, pk):
+    try:
+        tag = await Tag.objects.aget(pk=pk)
+    except (Tag.DoesNotExist, TypeError, ValueError):
+        return None
+    return {'id': tag.id, 'name': tag.name, 'color': tag.color,
+            'slug': tag.slug}
+
+
+def ingredient_fields(ingredient):
+    return {'id': ingredient.id, 'name': ingredient.name,
+            'measurement_unit': ingredient.units}
+
+
+async def ingredient_list(view, request):
+    name = request.query_params.get(view.search_param)
+    if not name:
+        return await ingredients_payload.aresponse(request)
+    return [
+        ingredient_fields(ingredient) for ingredient in
+        await ingredient_index.asearch(name, view.search_limit)
+    ]
+
+
+async def ingredient_detail(view, request, pk):
+    try:
+        return ingredient_fields(await Ingredient.objects.aget(pk=pk))
+    except (Ingredient.DoesNotExist, TypeError, ValueError):
+        return None
+
+
+async def subscriptions(view, request):
+    recipes_limit, error = view.get_recipes_limit(request)
+    if error or view.paginator.cursor_query_param in request.query_params:
+        return None
+    queryset = User.objects.filter(
+        following__user=request.user).order_by('id')
+    try:
+        page = await view.paginator.apaginate_queryset(queryset, request)
+    except InvalidPage:
+        return None
+    authors = [author async for author in page]
+    recipes = defaultdict(list)
+    async for recipe in view.get_subscription_recipes(recipes_limit).filter(
+            author__in=[author.id for author in authors]):
+        recipes[recipe.author_id].append(brief_recipe(recipe, request))
+    return view.paginator.get_paginated_response([
+        {
+            **user_fields(author, True),
+            'recipes': recipes[author.id],
+            'recipes_count': author.recipes_count,
+        }
+        for author in authors
+    ]).data
+
+
+READ_HANDLERS = {
+    'recipe-list': recipe_list,
+    'recipe-detail': recipe_detail,
+    'tag-list': tag_list,
+    'tag-detail': tag_detail,
+    'ingredient-list': ingredient_list,
+    'ingredient-detail': ingredient_detail,
+    'user-subscriptions': subscriptions,
+}
+
+
+def with_async_reads(urlpatterns):
+    """Заменяет представления роутера асинхронными там, где есть
+       асинхронный обработчик чтения."""
+
+    return [
+        URLPattern(pattern.pattern,
+                   async_read(pattern.callback, READ_HANDLERS[pattern.name]),
+                   pattern.default_args, pattern.name)
+        if pattern.name in READ_HANDLERS else pattern
+        for pattern in urlpatterns
+    ]
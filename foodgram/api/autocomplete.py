@@ -0,0 +1,107 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from recipes.models import Ingredient
+from .snapshots import LazySnapshot
+
+EXACT, PREFIX, CONTAINS, SIMILAR = range(4)
+
+
+def normalize(value):
+    """Приводит строку к виду, в котором она хранится в индексе."""
+
+    return value.casefold().replace('ё', 'е').strip()
+
+
+def trigrams(value):
+    """Возвращает множество триграмм строки с дополнением пробелами."""
+
+    padded = f'  {value} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientSnapshot:
+    """Неизменяемый снимок таблицы ингредиентов для поиска."""
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            (normalize(ingredient.name), ingredient.id, ingredient)
+            for ingredient in ingredients
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.ingredients = [ingredient for _, _, ingredient in entries]
+        self.trigrams = defaultdict(list)
+        self.trigram_counts = []
+        for position, key in enumerate(self.keys):
+            key_trigrams = trigrams(key)
+            self.trigram_counts.append(len(key_trigrams))
+            for trigram in key_trigrams:
+                self.trigrams[trigram].append(position)
+
+    def prefix_range(self, query):
+        """Возвращает границы ингредиентов, начинающихся с query."""
+
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\uffff', lo=start)
+        return start, end
+
+    def search(self, query, limit, similarity):
+        """Ищет ингредиенты, ранжируя совпадения: точное, по префиксу,
+           по подстроке, затем похожие по триграммам."""
+
+        ranked = {}
+        start, end = self.prefix_range(query)
+        for position in range(start, min(end, start + limit)):
+            ranked[position] = (
+                (EXACT if self.keys[position] == query else PREFIX), 0)
+        if len(ranked) < limit:
+            self.add_similar(query, ranked, similarity)
+        order = sorted(ranked, key=lambda position: (ranked[position],
+                                                     position))
+        return [self.ingredients[position] for position in order[:limit]]
+
+    def add_similar(self, query, ranked, similarity):
+        """Дополняет результаты совпадениями по подстроке и похожими
+           по триграммам названиями."""
+
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+        for position, count in shared.items():
+            if position in ranked:
+                continue
+            if query in self.keys[position]:
+                ranked[position] = (CONTAINS, 0)
+                continue
+            score = count / (len(query_trigrams)
+                             + self.trigram_counts[position] - count)
+            if score >= similarity:
+                ranked[position] = (SIMILAR, -score)
+
+
+class IngredientIndex(LazySnapshot):
+    """Индекс ингредиентов для автодополнения, загружаемый в память
+       процесса при первом обращении."""
+
+    similarity = 0.3
+
+    def build(self):
+        return IngredientSnapshot(
+            Ingredient.objects.only('id', 'name', 'units'))
+
+    def search(self, query, limit):
+        query = normalize(query)
+        if not query:
+            return []
+        return self.get_snapshot().search(query, limit, self.similarity)
+
+    async def asearch(self, query, limit):
+        query = normalize(query)
+        if not query:
+            return []
+        snapshot = await self.aget_snapshot()
+        return snapshot.search(query, limit, self.similarity)
+
+
+ingredient_index = IngredientIndex()
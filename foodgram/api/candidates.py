@@ -0,0 +1,222 @@
+import threading
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+
+from recipes.models import Recipe
+from .membership import get_membership
+from .replicas import PRIMARY_COOKIE
+from .snapshots import LazySnapshot
+
+
+def to_bitmap(positions):
+    """Собирает битовую карту из номеров позиций за один проход."""
+
+    positions = list(positions)
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def iter_positions_desc(bitmap):
+    """Перебирает установленные биты от старшего к младшему."""
+
+    bits = bin(bitmap)
+    top = len(bits) - 1
+    index = bits.find('1', 2)
+    while index != -1:
+        yield top - index
+        index = bits.find('1', index + 1)
+
+
+class RecipeSets:
+    """Множества рецептов по тегам и авторам.
+
+    Позиция рецепта — его номер в порядке (pub_date, id), поэтому
+    старшие биты соответствуют началу ленты. Теги покрывают большую
+    часть рецептов и хранятся битовыми картами, у автора рецептов
+    немного, и для него хранится список позиций.
+    """
+
+    def __init__(self, recipes, recipe_tags):
+        self.ids = []
+        self.positions = {}
+        self.authors = defaultdict(list)
+        self.last_key = None
+        for recipe_id, author_id, pub_date in recipes:
+            self.append(recipe_id, author_id, pub_date)
+        self.all = to_bitmap(range(len(self.ids)))
+        tag_positions = defaultdict(list)
+        for recipe_id, tag_id in recipe_tags:
+            tag_positions[tag_id].append(self.positions[recipe_id])
+        self.tags = {tag_id: to_bitmap(positions)
+                     for tag_id, positions in tag_positions.items()}
+
+    def append(self, recipe_id, author_id, pub_date):
+        position = len(self.ids)
+        self.ids.append(recipe_id)
+        self.positions[recipe_id] = position
+        self.authors[author_id].append(position)
+        self.last_key = (pub_date, recipe_id)
+        return position
+
+    def get_bitmap(self, recipe_ids):
+        return to_bitmap(
+            self.positions[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in self.positions)
+
+
+class Candidates:
+    """Отфильтрованные рецепты для пагинатора Django.
+
+    Количество считается по битовой карте, а из БД загружается только
+    срез текущей страницы.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, sets, bitmap):
+        self.queryset = queryset
+        self.sets = sets
+        self.bitmap = bitmap
+
+    def count(self):
+        return self.bitmap.bit_count()
+
+    async def acount(self):
+        return self.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        positions = islice(iter_positions_desc(self.bitmap),
+                           page.start, page.stop)
+        return self.queryset.filter(
+            id__in=[self.sets.ids[position] for position in positions]
+        ).order_by('-pub_date', '-id')
+
+    def __iter__(self):
+        return iter(self[0:None])
+
+    def prefetch_related(self, *lookups):
+        return Candidates(
+            self.queryset.prefetch_related(*lookups), self.sets, self.bitmap)
+
+
+class RecipeSetIndex(LazySnapshot):
+    """Индекс для вычисления фильтров ленты операциями над множествами.
+
+    Снимок строится при первом обращении и обновляется сигналами
+    о создании и удалении рецептов и изменении их тегов. Изменения из
+    других процессов попадают в индекс при перестроении снимка раз в
+    RECIPE_FILTER_INDEX_MAX_AGE секунд, а пользователь, недавно
+    изменявший данные, до истечения cookie читает ленту из БД.
+    Избранное и корзина берутся из Membership текущего запроса.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._update_lock = threading.Lock()
+
+    def build(self):
+        return RecipeSets(
+            Recipe.objects.order_by('pub_date', 'id').values_list(
+                'id', 'author_id', 'pub_date').iterator(),
+            Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id').iterator(),
+        )
+
+    def get_max_age(self):
+        return settings.RECIPE_FILTER_INDEX_MAX_AGE
+
+    def update(self, change, *args):
+        """Применяет изменение к текущему снимку.
+
+        Снимок, который строится в этот момент, будет отброшен, так как
+        мог быть прочитан из БД до изменения.
+        """
+
+        with self._update_lock:
+            self._version += 1
+            snapshot = self._snapshot
+            if snapshot is not None and not change(snapshot, *args):
+                self._snapshot = None
+
+    @staticmethod
+    def _add_recipe(sets, recipe_id, author_id, pub_date):
+        if sets.last_key is not None and (
+                (pub_date, recipe_id) < sets.last_key):
+            return False
+        position = sets.append(recipe_id, author_id, pub_date)
+        sets.all |= 1 << position
+        return True
+
+    @staticmethod
+    def _remove_recipe(sets, recipe_id):
+        position = sets.positions.get(recipe_id)
+        if position is not None:
+            sets.all &= ~(1 << position)
+        return True
+
+    @staticmethod
+    def _set_tags(sets, recipe_ids, tag_ids, added):
+        for recipe_id in recipe_ids:
+            position = sets.positions.get(recipe_id)
+            if position is None:
+                return False
+            for tag_id in tag_ids:
+                bitmap = sets.tags.get(tag_id, 0)
+                if added:
+                    sets.tags[tag_id] = bitmap | 1 << position
+                else:
+                    sets.tags[tag_id] = bitmap & ~(1 << position)
+        return True
+
+    def add_recipe(self, recipe_id, author_id, pub_date):
+        self.update(self._add_recipe, recipe_id, author_id, pub_date)
+
+    def remove_recipe(self, recipe_id):
+        self.update(self._remove_recipe, recipe_id)
+
+    def add_tags(self, recipe_ids, tag_ids):
+        self.update(self._set_tags, recipe_ids, tag_ids, True)
+
+    def remove_tags(self, recipe_ids, tag_ids):
+        self.update(self._set_tags, recipe_ids, tag_ids, False)
+
+    def filter(self, queryset, request, filters):
+        """Возвращает Candidates для фильтров по тегам, автору, избранному
+           и корзине или None, если запрос нужно выполнить в БД."""
+
+        user = request.user
+        favorited = filters.get('is_favorited') and user.is_authenticated
+        in_cart = filters.get('is_in_shopping_cart') and user.is_authenticated
+        if (not settings.RECIPE_FILTER_INDEX
+                or PRIMARY_COOKIE in request.COOKIES
+                or filters.get('search')
+                or not (filters.get('tags') or favorited or in_cart)):
+            return None
+
+        sets = self.get_snapshot()
+        bitmap = sets.all
+        if filters.get('tags'):
+            tags = 0
+            for tag in filters['tags']:
+                tags |= sets.tags.get(tag.id, 0)
+            bitmap &= tags
+        if filters.get('author') is not None:
+            bitmap &= to_bitmap(sets.authors.get(filters['author'].id, ()))
+        membership = get_membership(request)
+        if favorited:
+            bitmap &= sets.get_bitmap(membership.favorite_ids)
+        if in_cart:
+            bitmap &= sets.get_bitmap(membership.shopping_cart_ids)
+        return Candidates(queryset, sets, bitmap)
+
+
+recipe_sets = RecipeSetIndex()
@@ -1,6 +1,12 @@
-from django_filters.rest_framework import FilterSet, filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from django_filters import utils
+from django_filters.rest_framework import (DjangoFilterBackend, FilterSet,
+                                           filters)
 
 from recipes.models import Recipe, Tag
+from .candidates import recipe_sets
 
 
 class RecipeFilter(FilterSet):
@@ -14,6 +20,7 @@ class RecipeFilter(FilterSet):
         method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
+    search = filters.CharFilter(method='search_filter')
 
     class Meta:
         model = Recipe
@@ -35,3 +42,37 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def search_filter(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию рецепта с
+           сортировкой по релевантности. Вне PostgreSQL ищет по
+           вхождению подстроки."""
+
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value))
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+
+
+class RecipeFilterBackend(DjangoFilterBackend):
+    """Вычисляет фильтры страничного списка рецептов в памяти через
+       recipe_sets, когда это возможно, иначе фильтрует в БД."""
+
+    def filter_queryset(self, request, queryset, view):
+        filterset = self.get_filterset(request, queryset, view)
+        if filterset is None:
+            return queryset
+
+        if not filterset.is_valid() and self.raise_exception:
+            raise utils.translate_validation(filterset.errors)
+        paginator = view.paginator
+        if (view.action == 'list' and paginator is not None
+                and paginator.cursor_query_param not in request.query_params):
+            candidates = recipe_sets.filter(
+                queryset, request, filterset.form.cleaned_data)
+            if candidates is not None:
+                return candidates
+        return filterset.qs
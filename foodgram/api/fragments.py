@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .membership import get_membership
+
+
+def get_user_fields(recipe, membership):
+    """Возвращает флаги текущего пользователя для рецепта из аннотаций
+       queryset или из Membership запроса."""
+
+    is_favorited = getattr(recipe, 'is_favorited', None)
+    if is_favorited is None:
+        is_favorited = recipe.id in membership.favorite_ids
+    is_in_shopping_cart = getattr(recipe, 'is_in_shopping_cart', None)
+    if is_in_shopping_cart is None:
+        is_in_shopping_cart = recipe.id in membership.shopping_cart_ids
+    is_subscribed = getattr(recipe, 'author_is_subscribed', None)
+    if is_subscribed is None:
+        is_subscribed = recipe.author_id in membership.following_ids
+    return is_favorited, is_in_shopping_cart, is_subscribed
+
+
+def overlay(fragment, is_favorited, is_in_shopping_cart, is_subscribed):
+    """Подставляет во фрагмент поля текущего пользователя, сохраняя
+       порядок полей RecipeReadSerializer."""
+
+    return {
+        **fragment,
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+        'author': {**fragment['author'], 'is_subscribed': is_subscribed},
+    }
+
+
+class RecipeFragments:
+    """Кэш представлений рецептов без полей текущего пользователя.
+
+    В ключ входит cache_version рецепта, которая увеличивается в одной
+    транзакции с изменением рецепта, его ингредиентов, тегов и автора.
+    Поэтому фрагменты не нужно удалять: после изменения их ключи больше
+    не запрашиваются ни одним процессом и вытесняются по таймауту.
+    Флаги избранного, корзины и подписки подставляются для каждого
+    запроса.
+    """
+
+    def get_keys(self, recipes, request):
+        # Ссылки на изображения абсолютные и зависят от адреса сервера.
+        base_url = request.build_absolute_uri('/')
+        return {
+            recipe.id: f'recipe:{base_url}:{recipe.id}:'
+                       f'{recipe.cache_version}'
+            for recipe in recipes
+        }
+
+    def split(self, recipes, keys, cached):
+        fragments = {
+            recipe_id: cached[key] for recipe_id, key in keys.items()
+            if key in cached
+        }
+        missing = [recipe for recipe in recipes
+                   if recipe.id not in fragments]
+        return fragments, missing
+
+    def add_built(self, keys, fragments, data):
+        """Добавляет построенные представления во фрагменты и
+           возвращает новые записи кэша."""
+
+        built = {}
+        for item in data:
+            fragment = overlay(item, None, None, None)
+            fragments[item['id']] = fragment
+            built[keys[item['id']]] = fragment
+        return built
+
+    def merge(self, recipes, request, fragments):
+        membership = get_membership(request)
+        return [
+            overlay(fragments[recipe.id],
+                    *get_user_fields(recipe, membership))
+            for recipe in recipes
+        ]
+
+    def serialize(self, recipes, request, build):
+        """Возвращает представления рецептов, строя функцией build
+           только отсутствующие в кэше."""
+
+        if not settings.RECIPE_FRAGMENT_CACHE:
+            return build(recipes)
+        keys = self.get_keys(recipes, request)
+        fragments, missing = self.split(
+            recipes, keys, cache.get_many(keys.values()))
+        if missing:
+            cache.set_many(
+                self.add_built(keys, fragments, build(missing)),
+                settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        return self.merge(recipes, request, fragments)
+
+    async def aserialize(self, recipes, request, build):
+        """Асинхронный вариант serialize с асинхронной функцией
+           build."""
+
+        if not settings.RECIPE_FRAGMENT_CACHE:
+            return await build(recipes)
+        keys = self.get_keys(recipes, request)
+        fragments, missing = self.split(
+            recipes, keys, await cache.aget_many(keys.values()))
+        if missing:
+            await cache.aset_many(
+                self.add_built(keys, fragments, await build(missing)),
+                settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        return self.merge(recipes, request, fragments)
+
+
+recipe_fragments = RecipeFragments()
@@ -0,0 +1,218 @@
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+PIXEL = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+class Command(BaseCommand):
+    help = ('Замер задержки, числа SQL запросов и пиковой памяти основных '
+            'эндпоинтов API на сгенерированных данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров каждого эндпоинта')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую БД и переиспользовать данные')
+        parser.add_argument(
+            '--output', help='Сохранить результаты в json файл')
+        parser.add_argument(
+            '--baseline', help='Сравнить результаты с json файлом')
+        parser.add_argument(
+            '--tolerance', type=float,
+            help='Допустимый рост p95 относительно базовой линии. Без '
+                 'параметра сравнивается только число запросов: время '
+                 'зависит от машины, на которой снята базовая линия')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError(
+                'Для вычисления p95 нужно не меньше двух замеров '
+                '(--repeat 2 и больше).')
+        with self.test_database(options):
+            results = self.run_benchmarks(options['repeat'])
+
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+                file.write('\n')
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    @contextmanager
+    def test_database(self, options):
+        """Создает тестовую БД со сгенерированными данными и удаляет ее
+           после выхода из блока."""
+
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root,
+                                      IMAGE_PROCESSING_WORKERS=0,
+                                      DATABASE_REPLICAS=[]):
+                self.prepare_data(options)
+                yield
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def prepare_data(self, options):
+        if Recipe.objects.exists():
+            return
+        call_command('load_ingredients',
+                     str(settings.BASE_DIR / 'ingredients.csv'),
+                     stdout=StringIO())
+        call_command(
+            'generate_fixtures', stdout=StringIO(),
+            users=options['users'], recipes=options['recipes'],
+            seed=options['seed'])
+
+    def get_endpoints(self):
+        """Возвращает список (название, метод, url, данные)."""
+
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)[:10])
+        self.counter = 0
+        run = uuid4().hex[:8]
+
+        def recipe_data():
+            self.counter += 1
+            return {
+                'name': f'Бенчмарк {run}-{self.counter}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': PIXEL,
+                'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+                'ingredients': [{'id': pk, 'amount': 10}
+                                for pk in ingredients],
+            }
+
+        own_recipe = self.client.post(
+            '/api/recipes/', recipe_data(), format='json').json()['id']
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        return [
+            ('recipes_list', 'get', '/api/recipes/', None),
+            ('recipes_list_limit_50', 'get', '/api/recipes/?limit=50', None),
+            ('recipes_by_tags', 'get', f'/api/recipes/?{tag_query}', None),
+            ('recipes_by_author', 'get',
+             f'/api/recipes/?author={recipe.author_id}', None),
+            ('recipes_favorited', 'get',
+             '/api/recipes/?is_favorited=1', None),
+            ('recipes_in_cart', 'get',
+             '/api/recipes/?is_in_shopping_cart=1', None),
+            ('recipes_search', 'get', '/api/recipes/?search=рецепт', None),
+            ('recipe_detail', 'get', f'/api/recipes/{recipe.id}/', None),
+            ('recipe_create', 'post', '/api/recipes/', recipe_data),
+            ('recipe_update', 'patch', f'/api/recipes/{own_recipe}/',
+             recipe_data),
+            ('subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', None),
+            ('users_list', 'get', '/api/users/', None),
+            ('ingredients_search', 'get', '/api/ingredients/?name=мол', None),
+            ('ingredients_list', 'get', '/api/ingredients/', None),
+            ('tags_list', 'get', '/api/tags/', None),
+            ('download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/', None),
+        ]
+
+    def request(self, method, url, data):
+        # Каждый запрос замеряется независимо, без cookie предыдущих.
+        self.client.cookies.clear()
+        response = getattr(self.client, method)(
+            url, data() if callable(data) else data, format='json')
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code} '
+                f'{response.content[:200]}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def run_benchmarks(self, repeat):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.order_by('id').first())
+        endpoints = self.get_endpoints()
+        results = {}
+        for name, method, url, data in endpoints:
+            self.request(method, url, data)
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    self.request(method, url, data)
+                    timings.append((time.perf_counter() - started) * 1000)
+                query_count = len(queries)
+            tracemalloc.start()
+            self.request(method, url, data)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            quantiles = statistics.quantiles(timings, n=20)
+            results[name] = {
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(quantiles[-1], 2),
+                'queries': query_count,
+                'peak_kb': round(peak / 1024, 1),
+            }
+        return results
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"endpoint":<26}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросы":>10}{"память, КБ":>12}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<26}{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                f'{result["queries"]:>10}{result["peak_kb"]:>12}')
+
+    def compare(self, results, path, tolerance):
+        """Сообщает о росте числа запросов относительно базовой линии,
+           а при заданном tolerance и о росте p95."""
+
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: запросов {base["queries"]} -> '
+                    f'{result["queries"]}')
+            if (tolerance is not None
+                    and result['p95_ms'] > base['p95_ms'] * (1 + tolerance)):
+                regressions.append(
+                    f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс')
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
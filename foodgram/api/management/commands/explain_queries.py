@@ -0,0 +1,147 @@
+import json
+import logging
+
+from django.apps import apps
+from django.core.management import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from users.models import User
+from .benchmark_api import Command as BenchmarkCommand
+
+
+# Узлы, которые читают весь свой вход прежде чем вернуть первую строку.
+BLOCKING_NODES = {'Aggregate', 'Hash', 'Materialize', 'SetOp', 'Sort',
+                  'WindowAgg'}
+
+# Справочники целиком кэшируются в памяти процесса и соединяются хешем,
+# их полное чтение ожидаемо.
+CATALOG_MODELS = (Ingredient, Tag)
+
+
+def iter_full_scans(plan, limited=False, parent=None):
+    """Возвращает узлы плана, читающие таблицу целиком.
+
+    Чтение без условия индекса допустимо, если индекс отдает строки в
+    нужном порядке для LIMIT без блокирующих узлов или для соединения
+    слиянием, а также при подсчете всех строк таблицы для пагинации.
+    """
+
+    if plan['Node Type'] == 'Limit':
+        limited = True
+    elif plan['Node Type'] in BLOCKING_NODES:
+        limited = False
+    if ('Relation Name' in plan and 'Index Cond' not in plan
+            and 'Recheck Cond' not in plan and not limited
+            and not (parent and parent['Node Type'] == 'Merge Join')
+            and not (parent and parent['Node Type'] == 'Aggregate'
+                     and parent.get('Strategy') == 'Plain'
+                     and 'Filter' not in plan)):
+        yield plan
+    for child in plan.get('Plans', ()):
+        yield from iter_full_scans(child, limited, plan)
+
+
+def iter_index_names(plan):
+    if 'Index Name' in plan:
+        yield plan['Index Name']
+    for child in plan.get('Plans', ()):
+        yield from iter_index_names(child)
+
+
+class Command(BenchmarkCommand):
+    help = ('Проверка планов SQL запросов GET эндпоинтов API на '
+            'сгенерированных данных: полное чтение больших таблиц '
+            'считается ошибкой')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую БД и переиспользовать данные')
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Таблицы с меньшим числом строк разрешено читать целиком')
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Выводить план каждого запроса')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Анализ планов поддерживается только для '
+                               'PostgreSQL.')
+        self.verbose_plans = options['verbose_plans']
+        request_logger = logging.getLogger('api.middleware')
+        request_logger.disabled = True
+        try:
+            with self.test_database(options):
+                with connection.cursor() as cursor:
+                    cursor.execute('VACUUM ANALYZE')
+                self.large_tables = self.get_large_tables(
+                    options['min_rows'])
+                problems = self.check_endpoints()
+        finally:
+            request_logger.disabled = False
+
+        if problems:
+            raise CommandError(
+                'Полное чтение больших таблиц:\n'
+                + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            'Все запросы используют индексы.'))
+
+    def get_large_tables(self, min_rows):
+        tables = set()
+        for model in apps.get_models(include_auto_created=True):
+            if (model._meta.managed and model not in CATALOG_MODELS
+                    and model.objects.count() >= min_rows):
+                tables.add(model._meta.db_table)
+        return tables
+
+    def explain(self, sql):
+        """Возвращает план запроса, построенный с запретом
+           последовательного чтения.
+
+        Если план все равно читает таблицу целиком, подходящего индекса
+        нет, поэтому результат не зависит от размера тестовых данных.
+        """
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def check_endpoints(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.order_by('id').first())
+        problems = []
+        for name, method, url, data in self.get_endpoints():
+            if method != 'get':
+                continue
+            with CaptureQueriesContext(connection) as queries:
+                self.request(method, url, data)
+            indexes = set()
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = self.explain(sql)
+                if self.verbose_plans:
+                    self.stdout.write(f'{name}: {sql}\n'
+                                      f'{json.dumps(plan, indent=2)}')
+                indexes.update(iter_index_names(plan))
+                for node in iter_full_scans(plan):
+                    if node['Relation Name'] in self.large_tables:
+                        problems.append(
+                            f'{name}: {node["Node Type"]} '
+                            f'{node["Relation Name"]} в запросе {sql[:300]}')
+            self.stdout.write(
+                f'{name:<26}{len(queries):>4}  {", ".join(sorted(indexes))}')
+        return problems
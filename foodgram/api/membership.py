@@ -0,0 +1,50 @@
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+
+class Membership:
+    """Избранное, корзина и подписки пользователя, загружаемые
+       не более одного раза за запрос."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def get_recipe_ids(self, model):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(model.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+
+    @cached_property
+    def favorite_ids(self):
+        return self.get_recipe_ids(Favorite)
+
+    @cached_property
+    def shopping_cart_ids(self):
+        return self.get_recipe_ids(ShoppingCart)
+
+    @cached_property
+    def following_ids(self):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(Subscription.objects.filter(
+            user=self.user).values_list('author_id', flat=True))
+
+
+def get_membership(request):
+    """Возвращает данные пользователя запроса, создавая их при первом
+       обращении."""
+
+    membership = getattr(request, '_membership', None)
+    if membership is None:
+        membership = request._membership = Membership(request.user)
+    return membership
+
+
+def invalidate_membership(request):
+    """Сбрасывает данные после изменения избранного, корзины или
+       подписок."""
+
+    request._membership = None
@@ -0,0 +1,176 @@
+import heapq
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Счетчик измеряемого запроса. Контекст копируется в потоки
+# sync_to_async, поэтому параллельные запросы не видят чужих счетчиков.
+current_timer = ContextVar('current_timer', default=None)
+
+
+class QueryTimer:
+    """Считает SQL запросы, их суммарное время и запоминает самые
+       медленные."""
+
+    def __init__(self, top):
+        self.top = top
+        self.count = 0
+        self.duration = 0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            item = (elapsed, self.count, sql)
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            elif self.top:
+                heapq.heappushpop(self.slowest, item)
+
+
+def record_query(execute, sql, params, many, context):
+    """Передает SQL запрос счетчику текущего запроса, если он
+       измеряется."""
+
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_connection_query_timer(sender, connection, **kwargs):
+    """Один раз подключает record_query к каждому соединению с БД."""
+
+    install_query_timer(connection)
+
+
+def get_view_name(view_func, request):
+    """Возвращает имя класса представления и действия DRF."""
+
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class ServerTimingMiddleware:
+    """Измеряет время запросов к БД, представления и рендеринга ответа.
+
+    Результат передается в заголовке Server-Timing и пишется в лог
+    одной json строкой. Для медленных запросов дополнительно логируются
+    самые долгие SQL запросы.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+        self.top_queries = settings.SLOW_REQUEST_TOP_QUERIES
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Соединения, открытые до загрузки middleware.
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        """Создает счетчик запросов к БД для текущего контекста."""
+
+        timer = QueryTimer(self.top_queries)
+        request._timing = {'timer': timer, 'started': time.perf_counter()}
+        return current_timer.set(timer)
+
+    def finish(self, request, response):
+        timing = request._timing
+        timer = timing['timer']
+        started = timing['started']
+        total = time.perf_counter() - started
+        view_finished = timing.get('render_started', started + total)
+        view = (view_finished - started
+                - timing.get('db_before_render', timer.duration))
+        render = timing.get('render_finished', view_finished) - view_finished
+        metrics = {
+            'db': timer.duration,
+            'view': max(view, 0),
+            'render': render,
+            'total': total,
+        }
+        response['Server-Timing'] = ', '.join(
+            [f'db;dur={metrics["db"] * 1000:.1f};'
+             f'desc="{timer.count} queries"']
+            + [f'{name};dur={metrics[name] * 1000:.1f}'
+               for name in ('view', 'render', 'total')]
+        )
+
+        resolver_match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': (get_view_name(resolver_match.func, request)
+                     if resolver_match else None),
+            'status': response.status_code,
+            'queries': timer.count,
+            **{f'{name}_ms': round(value * 1000, 1)
+               for name, value in metrics.items()},
+        }
+        level = logging.INFO
+        if total >= self.slow_request:
+            level = logging.WARNING
+            record['slowest_queries'] = [
+                {'ms': round(elapsed * 1000, 1), 'sql': sql}
+                for elapsed, _, sql in sorted(timer.slowest, reverse=True)
+            ]
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        timing = request._timing
+        timing['db_before_render'] = timing['timer'].duration
+        timing['render_started'] = time.perf_counter()
+
+        def rendered(response):
+            timing['render_finished'] = time.perf_counter()
+
+        response.add_post_render_callback(rendered)
+        return response
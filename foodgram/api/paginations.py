@@ -1,7 +1,56 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitCursorPagination(CursorPagination):
+    """Курсорная пагинация с параметром limit.
+
+    Пустой параметр cursor означает первую страницу.
+    """
+
+    page_size_query_param = 'limit'
+    ordering = ('-pk',)
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
 
 
 class LimitPageNumberPagination(PageNumberPagination):
-    """Переопределение названия параметра пагинации."""
+    """Переопределение названия параметра пагинации.
+
+    При наличии параметра cursor переключается на курсорную пагинацию
+    с порядком из атрибута cursor_ordering представления.
+    """
 
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = LimitCursorPagination()
+        self.cursor_paginator.ordering = getattr(
+            view, 'cursor_ordering', LimitCursorPagination.ordering)
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        """Асинхронный вариант страничной пагинации.
+
+        Возвращает queryset текущей страницы, не выполняя его.
+        Некорректный номер страницы приводит к InvalidPage.
+        """
+
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        self.page = paginator.page(self.get_page_number(request, paginator))
+        return self.page.object_list
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,112 @@
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_COOKIE = 'use_primary'
+
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """Направляет чтение в реплику, выбранную для текущего запроса,
+       а запись и миграции — в основную БД."""
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+@contextmanager
+def use_database(alias):
+    """Направляет чтение внутри блока в alias, None — в основную БД."""
+
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def get_read_database(request):
+    """Возвращает реплику для безопасного запроса или None.
+
+    Пользователь, недавно изменявший данные, получает cookie и до ее
+    истечения читает из основной БД, чтобы видеть свои изменения.
+    """
+
+    if (not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or PRIMARY_COOKIE in request.COOKIES):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def get_primary_cookie_age():
+    """Время после записи, в течение которого пользователь читает из
+       основной БД, минуя отстающие реплики и индекс фильтров."""
+
+    ages = []
+    if settings.DATABASE_REPLICAS:
+        ages.append(settings.REPLICA_LAG_SECONDS)
+    if settings.RECIPE_FILTER_INDEX:
+        ages.append(settings.RECIPE_FILTER_INDEX_MAX_AGE)
+    return max(ages, default=0)
+
+
+@contextmanager
+def atomic_requests(view=None):
+    """Транзакции баз с ATOMIC_REQUESTS, как у обработчика Django,
+       кроме отключенных non_atomic_requests у view."""
+
+    non_atomic = getattr(view, '_non_atomic_requests', set())
+    with ExitStack() as stack:
+        for alias, settings_dict in connections.settings.items():
+            if settings_dict['ATOMIC_REQUESTS'] and alias not in non_atomic:
+                stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+class ReplicaReadMixin:
+    """Выполняет безопасные запросы к viewset без транзакции с чтением
+       из реплики, изменяющие — в транзакции основной БД.
+
+    Аутентификация читает из основной БД, чтобы только что выданный
+    токен не оказался неизвестен отстающей реплике.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        view = super().as_view(*args, **kwargs)
+        view._non_atomic_requests = set(connections.settings)
+        return view
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        read_database.set(get_read_database(request))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with use_database(None):
+                return super().dispatch(request, *args, **kwargs)
+        with atomic_requests():
+            response = super().dispatch(request, *args, **kwargs)
+        max_age = get_primary_cookie_age()
+        if max_age and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=max_age,
+                httponly=True, samesite='Lax')
+        return response
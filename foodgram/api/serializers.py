@@ -1,13 +1,15 @@
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
+from recipes import shopping_lists
 from recipes.models import (Recipe, Tag, Ingredient, Achievement,
-                            IngredientAmount, Favorite, ShoppingCart)
-from users.models import User, Subscription
+                            IngredientAmount)
+from users.models import User
+from .membership import get_membership
 
 
 class AchievementSerializer(serializers.ModelSerializer):
@@ -51,10 +53,11 @@ class CustomUserSerializer(UserSerializer):
         """Проверка, что переданный пользователь подписан на этого
            пользователя."""
 
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(user=user, author=obj.id).exists()
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+        return obj.id in get_membership(
+            self.context.get('request')).following_ids
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -75,19 +78,48 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class BriefRecipeSerializer(serializers.ModelSerializer):
+class RecipeImageVariantsMixin(serializers.Serializer):
+    """Добавляет ссылки на миниатюру и уменьшенные варианты
+       изображения рецепта."""
+
+    image_thumb = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+
+    def build_image_url(self, name):
+        url = Recipe._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image_thumb(self, obj):
+        """Возвращает миниатюру или исходное изображение, пока
+           миниатюра не готова."""
+
+        name = obj.image_variants.get('thumb') or obj.image.name
+        return self.build_image_url(name) if name else None
+
+    def get_image_variants(self, obj):
+        return {
+            variant: self.build_image_url(name)
+            for variant, name in obj.image_variants.items()
+            if variant != 'source'
+        }
+
+
+class BriefRecipeSerializer(RecipeImageVariantsMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для вывода кортоткого описания рецепта."""
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumb', 'image_variants',
+                  'cooking_time')
 
 
 class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор для модели подписки."""
 
     recipes = BriefRecipeSerializer(read_only=True, many=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -102,16 +134,6 @@ class SubscriptionSerializer(CustomUserSerializer):
             'recipes_count'
         )
 
-    def to_representation(self, instance):
-        ret = super().to_representation(instance)
-        limit = self.context.get('limit')
-        if limit:
-            ret['recipes'] = ret['recipes'][:limit]
-        return ret
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
     """Сериализатор для вывода количества ингредиентов."""
@@ -145,7 +167,8 @@ class IngredientAmountCreateSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(RecipeImageVariantsMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для вывода рецепта."""
 
     is_favorited = serializers.SerializerMethodField()
@@ -158,35 +181,40 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', )
+        exclude = ('pub_date', 'search_vector', 'favorites_count',
+                   'in_carts_count', 'cache_version')
+
+    def to_representation(self, instance):
+        """Передает вложенному автору флаг подписки из аннотации."""
+
+        is_subscribed = getattr(instance, 'author_is_subscribed', None)
+        if is_subscribed is not None:
+            instance.author.is_subscribed = is_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
         """Проверяет добавлен ли рецепт в избранное."""
 
-        return (
-            self.context.get('request').user.is_authenticated
-            and Favorite.objects.filter(user=self.context['request'].user,
-                                        object_id=obj.id).exists()
-        )
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
+        return obj.id in get_membership(
+            self.context.get('request')).favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет добавлен ли рецепт в корзину покупок."""
 
-        return (
-            self.context.get('request').user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=self.context['request'].user,
-                object_id=obj.id).exists()
-        )
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
+        return obj.id in get_membership(
+            self.context.get('request')).shopping_cart_ids
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецептов."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = IngredientAmountCreateSerializer(many=True)
     image = Base64ImageField()
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -211,6 +239,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if len(dupes) > 0:
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.')
+        existing = Ingredient.objects.only('id').in_bulk(seen)
+        missing = [x['id'] for x in value if x['id'] not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не существуют: '
+                f'{", ".join(map(str, missing))}.')
         return value
 
     def validate_tags(self, value):
@@ -223,26 +257,61 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if len(dupes) > 0:
             raise serializers.ValidationError(
                 'Теги не должны повторяться.')
-        return value
+        tags = Tag.objects.in_bulk(seen)
+        missing = [x for x in value if x not in tags]
+        if missing:
+            raise serializers.ValidationError(
+                f'Теги не существуют: {", ".join(map(str, missing))}.')
+        return [tags[x] for x in value]
 
     def add_tags_ingredients(self, recipe, tags, ingredients):
-        """Добавляет теги и ингридиенты в рецепт."""
+        """Добавляет теги и ингридиенты в новый рецепт."""
 
-        recipe.tags.set(tags)
-        try:
-            prepared_ingredient = [(
-                Ingredient.objects.get(id=ingredient['id']),
-                ingredient['amount']) for ingredient in ingredients]
-        except ObjectDoesNotExist:
-            raise ValidationError('Ингредиент не существует.')
+        recipe.tags.add(*tags)
+        IngredientAmount.objects.bulk_create(
+            [IngredientAmount(
+                recipe=recipe,
+                ingredient_id=x['id'],
+                amount=x['amount']
+            ) for x in ingredients]
+        )
+
+    def update_tags_ingredients(self, recipe, tags, ingredients):
+        """Приводит теги и ингредиенты рецепта к переданным, изменяя
+           только отличающиеся строки, и переносит изменения в списки
+           покупок пользователей, у которых рецепт в корзине."""
 
+        recipe.tags.set(tags)
+        amounts = {
+            amount.ingredient_id: amount
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        new_amounts = {x['id']: x['amount'] for x in ingredients}
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            new_amount = new_amounts.get(ingredient_id)
+            if new_amount is not None and new_amount != amount.amount:
+                amount.amount = new_amount
+                changed.append(amount)
+        removed = [amount.id for ingredient_id, amount in amounts.items()
+                   if ingredient_id not in new_amounts]
+        added = new_amounts.keys() - amounts.keys()
+        if not (changed or removed or added):
+            return
+        shopping_lists.remove_recipes([recipe.id])
+        if removed:
+            IngredientAmount.objects.filter(id__in=removed).delete()
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
         IngredientAmount.objects.bulk_create(
             [IngredientAmount(
                 recipe=recipe,
-                ingredient=x[0],
-                amount=x[1]
-            ) for x in prepared_ingredient]
+                ingredient_id=ingredient_id,
+                amount=amount
+            ) for ingredient_id, amount in new_amounts.items()
+                if ingredient_id in added]
         )
+        shopping_lists.add_recipes([recipe.id])
 
     def create(self, validated_data):
         """Создает рецепт из данных, переданных пользователем."""
@@ -256,16 +325,16 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Редактирует рецепт данными переданными пользователем."""
 
-        ingredients = validated_data.get('ingredients')
+        ingredients = validated_data.pop('ingredients', None)
         if not ingredients:
             raise serializers.ValidationError(
                   'Ингридиенты не указаны.')
 
-        tags = validated_data.get('tags')
+        tags = validated_data.pop('tags', None)
         if not tags:
             raise serializers.ValidationError(
                   'Теги не указаны.')
-        cooking_time = validated_data.get('cooking_tim')
+        cooking_time = validated_data.get('cooking_time')
         if not cooking_time:
             raise serializers.ValidationError(
                   'Время готовки не указаны.')
@@ -273,14 +342,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if not text:
             raise serializers.ValidationError(
                   'Текст пустой.')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        self.add_tags_ingredients(instance, tags, ingredients)
+        self.update_tags_ingredients(instance, tags, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        """Возвращает read сереализатор для данной модели."""
+        """Возвращает read сереализатор для данной модели, загружая
+           теги и ингредиенты рецепта двумя запросами."""
 
+        prefetch_related_objects([instance], 'tags', Prefetch(
+            'amounts',
+            queryset=IngredientAmount.objects.select_related('ingredient')
+        ))
         return RecipeReadSerializer(instance,
                                     context=self.context).data
 
@@ -299,3 +371,14 @@ class RecipeFavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id для пакетного добавления и удаления."""
+
+    ids = serializers.ListField(
+        # Большие значения не передать в БД, где id хранятся в bigint.
+        child=serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_IDS
+    )
@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, Tag
+from .autocomplete import ingredient_index
+from .candidates import recipe_sets
+from .snapshots import ingredients_payload, tags_payload
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс автодополнения после изменения ингредиентов."""
+
+    transaction.on_commit(ingredient_index.invalidate)
+    transaction.on_commit(ingredients_payload.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_payload(sender, **kwargs):
+    """Сбрасывает готовый список тегов после изменения тегов."""
+
+    transaction.on_commit(tags_payload.invalidate)
+    transaction.on_commit(recipe_sets.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_sets(sender, instance, created, **kwargs):
+    """Добавляет новый рецепт в индекс фильтров ленты."""
+
+    if created:
+        transaction.on_commit(partial(
+            recipe_sets.add_recipe, instance.id, instance.author_id,
+            instance.pub_date))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_sets(sender, instance, **kwargs):
+    """Исключает удаленный рецепт из индекса фильтров ленты."""
+
+    transaction.on_commit(partial(recipe_sets.remove_recipe, instance.id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_recipe_tags_in_sets(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """Переносит изменение тегов рецепта в индекс фильтров ленты."""
+
+    if action == 'pre_clear':
+        pk_set = set(
+            instance.recipes.values_list('id', flat=True) if reverse
+            else instance.tags.values_list('id', flat=True))
+        action = 'post_remove'
+    if action not in ('post_add', 'post_remove'):
+        return
+    recipe_ids, tag_ids = (pk_set, {instance.pk}) if reverse else (
+        {instance.pk}, pk_set)
+    update = (recipe_sets.add_tags if action == 'post_add'
+              else recipe_sets.remove_tags)
+    transaction.on_commit(partial(update, recipe_ids, tag_ids))
@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import re
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+from .replicas import use_database
+from .serializers import IngredientSerializer, TagSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING_RE = {
+    'br': re.compile(r'\bbr\b'),
+    'gzip': re.compile(r'\bgzip\b'),
+}
+
+
+class LazySnapshot:
+    """Значение, которое строится при первом обращении и сбрасывается
+       сигналами об изменении исходных данных.
+
+    Сигналы приходят только в процесс, изменивший данные, а bulk_create
+    их не отправляет, поэтому снимок старше get_max_age() секунд
+    перестраивается при следующем обращении.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._built = 0
+
+    def build(self):
+        raise NotImplementedError
+
+    def get_max_age(self):
+        """Возвращает срок жизни снимка в секундах или None."""
+
+        return settings.SNAPSHOT_MAX_AGE
+
+    def invalidate(self):
+        """Сбрасывает снимок, он будет перестроен при следующем запросе."""
+
+        self._version += 1
+        self._snapshot = None
+
+    def get_current(self):
+        """Возвращает построенный снимок, если он не устарел."""
+
+        snapshot = self._snapshot
+        max_age = self.get_max_age()
+        if (snapshot is not None and max_age is not None
+                and time.monotonic() - self._built > max_age):
+            self.invalidate()
+            return None
+        return snapshot
+
+    def get_snapshot(self):
+        snapshot = self.get_current()
+        if snapshot is None:
+            with self._lock:
+                snapshot = self.get_current()
+                if snapshot is None:
+                    version = self._version
+                    started = time.monotonic()
+                    with use_database(None):
+                        snapshot = self.build()
+                    if version == self._version:
+                        self._built = started
+                        self._snapshot = snapshot
+        return snapshot
+
+    async def aget_snapshot(self):
+        """Асинхронный вариант get_snapshot, уходящий в поток только
+           для построения снимка."""
+
+        snapshot = self.get_current()
+        if snapshot is None:
+            snapshot = await sync_to_async(self.get_snapshot)()
+        return snapshot
+
+
+class Payload:
+    """Отрендеренный JSON ответ и его сжатые варианты."""
+
+    def __init__(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        self.variants = {None: (content, quote_etag(digest))}
+        self.variants['gzip'] = (
+            gzip.compress(content, mtime=0), quote_etag(f'{digest}-gzip'))
+        if brotli is not None:
+            self.variants['br'] = (
+                brotli.compress(content), quote_etag(f'{digest}-br'))
+
+    def get_variant(self, accept_encoding):
+        """Выбирает вариант ответа по заголовку Accept-Encoding."""
+
+        for encoding, pattern in ACCEPT_ENCODING_RE.items():
+            if encoding in self.variants and pattern.search(accept_encoding):
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+class PayloadSnapshot(LazySnapshot):
+    """Заранее отрендеренный список объектов для неизменяемых
+       справочников, отдаваемый без обращения к БД."""
+
+    def __init__(self, queryset, serializer_class):
+        super().__init__()
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+
+    def build(self):
+        serializer = self.serializer_class(self.queryset.all(), many=True)
+        return Payload(JSONRenderer().render(serializer.data))
+
+    def response(self, request):
+        return self.build_response(self.get_snapshot(), request)
+
+    async def aresponse(self, request):
+        return self.build_response(await self.aget_snapshot(), request)
+
+    def build_response(self, payload, request):
+        """Возвращает ответ со сжатым вариантом и ETag, либо 304."""
+
+        encoding, (content, etag) = payload.get_variant(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                content, content_type=JSONRenderer.media_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+tags_payload = PayloadSnapshot(Tag.objects.all(), TagSerializer)
+ingredients_payload = PayloadSnapshot(
+    Ingredient.objects.all(), IngredientSerializer)
@@ -0,0 +1,1005 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import (AsyncClient, RequestFactory, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.images import schedule_image_processing
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Subscription, User
+from .async_views import with_async_reads
+from .autocomplete import ingredient_index
+from .candidates import recipe_sets
+from .management.commands.benchmark_api import Command as BenchmarkCommand
+from .replicas import PRIMARY_COOKIE, get_read_database
+from .serializers import RecipeCreateSerializer
+from .snapshots import ingredients_payload, tags_payload
+from .urls import router
+
+PIXEL = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+RECIPE_DATA = {
+    'name': 'Отредактированный рецепт',
+    'text': 'Новый текст',
+    'cooking_time': 15,
+    'image': PIXEL,
+}
+
+# Маршруты API с асинхронными представлениями чтения для сравнения
+# с синхронными, подключаются через ROOT_URLCONF.
+urlpatterns = [
+    path('api/', include((with_async_reads(router.urls), 'api'))),
+]
+
+
+class TemporaryMediaMixin:
+    """Сохраняет загруженные в тестах изображения во временный
+       каталог, удаляемый после тестов класса."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class APITestCase(TestCase):
+    """Общие данные: пользователи, теги, ингредиенты и рецепты."""
+
+    RECIPES = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{i}@example.com', username=f'user{i}',
+                first_name='Имя', last_name='Фамилия', password='Pa55word!')
+            for i in range(3)
+        ]
+        cls.user = cls.users[0]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}',
+                               color=f'#00000{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}', units='г')
+            for i in range(5)
+        ]
+        cls.recipes = []
+        for i in range(cls.RECIPES):
+            recipe = Recipe.objects.create(
+                author=cls.users[i % 3], name=f'Рецепт {i}', text='Текст',
+                cooking_time=10)
+            recipe.tags.set(cls.tags[:1 + i % 3])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(recipe=recipe, ingredient=ingredient,
+                                 amount=j + 1)
+                for j, ingredient in enumerate(cls.ingredients[:2 + i % 3])
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.users[1])
+
+    def setUp(self):
+        # Откат транзакции теста не отправляет сигналы, поэтому снимки
+        # в памяти сбрасываются явно.
+        for snapshot in (ingredient_index, ingredients_payload,
+                         tags_payload, recipe_sets):
+            snapshot.invalidate()
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeQueryCountTest(APITestCase):
+    """Число запросов списка и рецепта не зависит от размера
+       страницы."""
+
+    def assert_queries(self, client, url, count):
+        # Кэш фрагментов очищается, чтобы замерять полную загрузку.
+        cache.clear()
+        with self.assertNumQueries(count):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_anonymous(self):
+        for limit in (1, 20):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    self.anonymous, f'/api/recipes/?limit={limit}', 4)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_authenticated(self):
+        for limit in (1, 20):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    self.client, f'/api/recipes/?limit={limit}', 4)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        self.assert_queries(self.anonymous, url, 3)
+        response = self.assert_queries(self.client, url, 3)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['is_in_shopping_cart'])
+
+
+class SnapshotMaxAgeTest(APITestCase):
+    """Снимки справочников перестраиваются по сроку жизни, даже если
+       данные изменены без сигналов."""
+
+    def test_bulk_created_ingredient_appears(self):
+        # Собирает снимки, оставшиеся от предыдущих тестов.
+        self.anonymous.get('/api/ingredients/?name=ингредиент')
+        self.anonymous.get('/api/ingredients/')
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Ингредиент без сигнала', units='г')])
+        with self.settings(SNAPSHOT_MAX_AGE=0):
+            search = self.anonymous.get(
+                '/api/ingredients/?name=без сигнала')
+            full = self.anonymous.get('/api/ingredients/')
+        self.assertEqual(
+            [item['name'] for item in search.json()],
+            ['Ингредиент без сигнала'])
+        self.assertIn('Ингредиент без сигнала',
+                      [item['name'] for item in full.json()])
+
+
+class CounterTest(TemporaryMediaMixin, APITestCase):
+    """Сохранение объекта не затирает счетчики, измененные после его
+       загрузки."""
+
+    def test_recipe_save_keeps_favorites_count(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        other = APIClient()
+        other.force_authenticate(self.users[1])
+        other.post(f'/api/recipes/{recipe.id}/favorite/')
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 2)
+
+    def test_recipe_update_keeps_counters(self):
+        recipe = self.recipes[0]
+        update_tags_ingredients = (
+            RecipeCreateSerializer.update_tags_ingredients)
+
+        def add_favorite(serializer, instance, *args):
+            # Параллельный запрос между загрузкой и сохранением рецепта.
+            Favorite.objects.create(user=self.users[1], recipe=instance)
+            return update_tags_ingredients(serializer, instance, *args)
+
+        with mock.patch.object(RecipeCreateSerializer,
+                               'update_tags_ingredients', add_favorite):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/', RECIPE_DATA | {
+                    'tags': [self.tags[0].id],
+                    'ingredients': [{'id': self.ingredients[0].id,
+                                     'amount': 5}],
+                }, format='json')
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 2)
+        self.assertEqual(recipe.in_carts_count, 1)
+
+    def test_user_save_keeps_followers_count(self):
+        author = User.objects.get(pk=self.users[2].pk)
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        author.first_name = 'Другое'
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.first_name, 'Другое')
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.recipes_count, self.RECIPES // 3)
+
+
+class RecipeFragmentCacheTest(TemporaryMediaMixin, APITestCase):
+    """Кэш представления рецепта сбрасывается при его изменении."""
+
+    def test_detail_changes_after_update(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.id}/'
+        self.assertEqual(self.client.get(url).data['text'], 'Текст')
+        response = self.client.patch(url, RECIPE_DATA | {
+            'tags': [self.tags[2].id],
+            'ingredients': [{'id': self.ingredients[4].id, 'amount': 7}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = self.client.get(url).data
+        self.assertEqual(data['name'], RECIPE_DATA['name'])
+        self.assertEqual(data['text'], RECIPE_DATA['text'])
+        self.assertEqual([tag['id'] for tag in data['tags']],
+                         [self.tags[2].id])
+        self.assertEqual(
+            [(item['id'], item['amount']) for item in data['ingredients']],
+            [(self.ingredients[4].id, 7)])
+
+    def test_stale_instance_save_changes_detail(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        url = f'/api/recipes/{recipe.id}/'
+        # Версия увеличивается после загрузки recipe, и представление
+        # с новой версией попадает в кэш.
+        self.recipes[0].tags.add(self.tags[2])
+        self.assertEqual(self.client.get(url).data['text'], 'Текст')
+        recipe.text = 'Новый текст'
+        recipe.save()
+        self.assertEqual(self.client.get(url).data['text'], 'Новый текст')
+
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class RecipeImageTest(TemporaryMediaMixin, APITestCase):
+    """Обработка изображений рецептов и удаление прежних вариантов."""
+
+    VARIANTS = {'source', 'webp', 'thumb', 'thumb_webp', 'medium',
+                'medium_webp'}
+
+    def setUp(self):
+        super().setUp()
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def save(self, method, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, RECIPE_DATA | {
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': self.ingredients[0].id,
+                                 'amount': 5}],
+            }, format='json')
+        self.assertIn(response.status_code, (200, 201))
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def test_variants(self):
+        recipe = self.save('post', '/api/recipes/')
+        self.assertEqual(set(recipe.image_variants), self.VARIANTS)
+        self.assertEqual(recipe.image.name, recipe.image_variants['source'])
+        for name in recipe.image_variants.values():
+            self.assertTrue(self.storage.exists(name), name)
+
+    def test_replaced_variants_deleted(self):
+        recipe = self.save('post', '/api/recipes/')
+        previous = recipe.image_variants
+        recipe = self.save('patch', f'/api/recipes/{recipe.id}/')
+        for name in previous.values():
+            self.assertFalse(self.storage.exists(name), name)
+        for name in recipe.image_variants.values():
+            self.assertTrue(self.storage.exists(name), name)
+
+    def test_broken_image(self):
+        recipe = self.recipes[0]
+        name = self.storage.save('recipes/broken.png',
+                                 ContentFile(b'not an image'))
+        Recipe.objects.filter(pk=recipe.pk).update(image=name)
+        with self.assertLogs('recipes.images', 'ERROR'):
+            schedule_image_processing(recipe.pk, name)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, name)
+        self.assertEqual(recipe.image_variants, {})
+
+class BatchIdsTest(APITestCase):
+    """Пакетные эндпоинты отклоняют id вне диапазона bigint."""
+
+    def test_out_of_range_ids(self):
+        for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/',
+                    '/api/users/subscribe/'):
+            for ids in ([2 ** 70], [0], [-1]):
+                with self.subTest(url=url, ids=ids):
+                    response = self.client.post(
+                        url, {'ids': ids}, format='json')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('ids', response.data)
+
+    def test_valid_ids(self):
+        response = self.client.post(
+            '/api/recipes/favorite/',
+            {'ids': [self.recipes[1].id, 2 ** 63 - 1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['added', 'not_found'])
+
+
+class BatchLinksTest(APITestCase):
+    """Пакетные эндпоинты изменяют счетчики одним запросом на пачку."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.users[2])
+
+    def count_queries(self, method, url, ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_same_queries(self, url, ids):
+        small, large = ids[:2], ids[2:22]
+        for method in (self.client.post, self.client.delete):
+            with self.subTest(url=url, method=method.__name__):
+                self.assertEqual(
+                    self.count_queries(method, url, small),
+                    self.count_queries(method, url, large))
+
+    def test_recipe_queries(self):
+        ids = [recipe.id for recipe in self.recipes]
+        for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+            self.assert_same_queries(url, ids)
+
+    def test_subscribe_queries(self):
+        authors = User.objects.bulk_create(
+            User(email=f'author{i}@example.com', username=f'author{i}')
+            for i in range(22))
+        self.assert_same_queries(
+            '/api/users/subscribe/', [author.id for author in authors])
+
+    def test_counters(self):
+        recipes = self.recipes[:4]
+        ids = [recipe.id for recipe in recipes]
+        counters = ('favorites_count', 'in_carts_count')
+        before = list(Recipe.objects.filter(pk__in=ids).order_by(
+            'pk').values_list(*counters))
+        for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+            self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=ids).order_by(
+                'pk').values_list(*counters)),
+            [(favorites + 1, carts + 1) for favorites, carts in before])
+        for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+            self.client.delete(url, {'ids': ids}, format='json')
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=ids).order_by(
+                'pk').values_list(*counters)), before)
+
+    def test_followers_count(self):
+        url = '/api/users/subscribe/'
+        ids = [self.users[0].id, self.users[1].id]
+        self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(
+            list(User.objects.filter(pk__in=ids).order_by(
+                'pk').values_list('followers_count', flat=True)), [1, 2])
+        self.client.delete(url, {'ids': ids}, format='json')
+        self.assertEqual(
+            list(User.objects.filter(pk__in=ids).order_by(
+                'pk').values_list('followers_count', flat=True)), [0, 1])
+
+class SubscriptionsTest(APITestCase):
+    """Подписки отдают не больше recipes_limit последних рецептов
+       автора и полное число его рецептов."""
+
+    def test_recipes_limit(self):
+        author = self.users[1]
+        expected = [recipe.id for recipe in reversed(self.recipes)
+                    if recipe.author_id == author.id]
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, 200)
+        [item] = response.data['results']
+        self.assertEqual(item['id'], author.id)
+        self.assertTrue(item['is_subscribed'])
+        self.assertEqual([recipe['id'] for recipe in item['recipes']],
+                         expected[:2])
+        self.assertEqual(item['recipes_count'], len(expected))
+
+    def test_without_limit(self):
+        response = self.client.get('/api/users/subscriptions/')
+        [item] = response.data['results']
+        self.assertEqual(len(item['recipes']), item['recipes_count'])
+
+    def test_invalid_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class DownloadShoppingCartTest(APITestCase):
+    """Выгрузка списка покупок в txt, csv и json с ETag."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    def get_expected(self):
+        return list(IngredientAmount.objects.filter(
+            recipe__shopping_cart__user=self.user
+        ).values_list(
+            'ingredient__name', 'ingredient__units'
+        ).annotate(total=Sum('amount')).order_by('ingredient__name'))
+
+    def download(self, file_format, **headers):
+        return self.client.get(f'{self.url}?format={file_format}', **headers)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json(self):
+        response = self.download('json')
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/json'))
+        self.assertEqual(
+            [(item['name'], item['measurement_unit'], item['amount'])
+             for item in json.loads(self.read(response))],
+            self.get_expected())
+
+    def test_csv(self):
+        response = self.download('csv')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=shopping_cart.csv')
+        rows = list(csv.reader(io.StringIO(self.read(response))))
+        self.assertEqual(rows[0], ['name', 'measurement_unit', 'amount'])
+        self.assertEqual(
+            [(name, units, int(amount)) for name, units, amount in rows[1:]],
+            self.get_expected())
+
+    def test_txt(self):
+        lines = self.read(self.download('txt')).split('\n')
+        self.assertEqual(lines[0], 'Cписок покупок:')
+        self.assertEqual(lines[1:], [
+            f'{name} - {total}({units})'
+            for name, units, total in self.get_expected()])
+
+    def test_not_modified(self):
+        etag = self.download('json')['ETag']
+        self.assertNotEqual(self.download('csv')['ETag'], etag)
+        response = self.download('json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.client.post(f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        response = self.download('json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_queries(self):
+        etag = self.download('json')['ETag']
+        # Для ответа 304 строки списка не читаются.
+        with self.assertNumQueries(1):
+            response = self.download('json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_after_moved_amount(self):
+        etag = self.download('json')['ETag']
+        items = ShoppingListItem.objects.filter(user=self.user)
+        first, second = items.order_by('ingredient_id')[:2]
+        # Число строк и общая сумма не меняются.
+        items.filter(pk=first.pk).update(amount=F('amount') + 1)
+        items.filter(pk=second.pk).update(amount=F('amount') - 1)
+        response = self.download('json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous(self):
+        response = self.anonymous.get(f'{self.url}?format=json')
+        self.assertEqual(response.status_code, 401)
+
+
+class ShoppingListTest(TemporaryMediaMixin, APITestCase):
+    """Суммы списков покупок совпадают с суммами ингредиентов рецептов
+       в корзинах после любых изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for recipe in cls.recipes[:6]:
+            ShoppingCart.objects.create(user=cls.users[1], recipe=recipe)
+
+    def assert_lists_match(self):
+        expected = IngredientAmount.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values_list(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+        self.assertCountEqual(
+            ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount'),
+            expected)
+
+    def test_created_links(self):
+        self.assert_lists_match()
+
+    def test_cart_toggle(self):
+        url = f'/api/recipes/{self.recipes[1].id}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_lists_match()
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assert_lists_match()
+
+    def test_batch(self):
+        url = '/api/recipes/shopping_cart/'
+        ids = [recipe.id for recipe in self.recipes[:8]]
+        self.client.post(url, {'ids': ids}, format='json')
+        self.assert_lists_match()
+        self.client.delete(url, {'ids': ids[2:]}, format='json')
+        self.assert_lists_match()
+
+    def test_orm_changes(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipes[2])
+        self.assert_lists_match()
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assert_lists_match()
+
+    def test_edit_amounts(self):
+        recipe = self.recipes[3]
+        amounts = list(recipe.amounts.order_by('ingredient_id'))
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/', RECIPE_DATA | {
+                'tags': [self.tags[0].id],
+                'ingredients': [
+                    {'id': amounts[0].ingredient_id,
+                     'amount': amounts[0].amount},
+                    {'id': amounts[1].ingredient_id, 'amount': 9},
+                    {'id': self.ingredients[4].id, 'amount': 4},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_lists_match()
+
+    def test_delete_recipe(self):
+        for recipe in self.recipes[:4]:
+            self.client.force_authenticate(recipe.author)
+            response = self.client.delete(f'/api/recipes/{recipe.id}/')
+            self.assertEqual(response.status_code, 204)
+            self.assert_lists_match()
+
+    def test_rebuild(self):
+        ShoppingListItem.objects.update(amount=1)
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        self.assert_lists_match()
+
+
+class IngredientSearchTest(APITestCase):
+    """Поиск ингредиентов по индексу автодополнения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('Сгущенное молоко', 'Молоко топленое', 'Молоко',
+                     'Мёд', 'Соль'):
+            Ingredient.objects.create(name=name, units='г')
+
+    def search(self, name):
+        response = self.anonymous.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_ranking(self):
+        self.assertEqual(self.search('молоко'),
+                         ['Молоко', 'Молоко топленое', 'Сгущенное молоко'])
+
+    def test_normalization(self):
+        self.assertEqual(self.search(' МЕД '), ['Мёд'])
+
+    def test_similar(self):
+        self.assertEqual(self.search('малоко')[0], 'Молоко')
+
+    def test_new_ingredient(self):
+        self.assertEqual(self.search('перец'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Перец', units='г')
+        self.assertEqual(self.search('перец'), ['Перец'])
+
+
+class RecipeSearchTest(APITestCase):
+    """Полнотекстовый поиск рецептов по названию и описанию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.in_name = Recipe.objects.create(
+            author=cls.user, name='Украинский борщ', text='Со сметаной',
+            cooking_time=60)
+        cls.in_text = Recipe.objects.create(
+            author=cls.user, name='Пампушки', text='Подаются к борщу',
+            cooking_time=30)
+
+    def search(self, value):
+        response = self.anonymous.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search(self):
+        found = self.search('борщ')
+        self.assertCountEqual(found, [self.in_name.id, self.in_text.id])
+        if connection.vendor == 'postgresql':
+            # Совпадение в названии весомее совпадения в описании.
+            self.assertEqual(found, [self.in_name.id, self.in_text.id])
+
+    def test_not_found(self):
+        self.assertEqual(self.search('пельмени'), [])
+
+
+class CursorPaginationTest(APITestCase):
+    """Курсорная пагинация списка рецептов."""
+
+    def test_pages(self):
+        ids, url = [], '/api/recipes/?cursor=&limit=10'
+        while url:
+            response = self.anonymous.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        expected = Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_invalid_cursor(self):
+        response = self.anonymous.get('/api/recipes/?cursor=invalid')
+        self.assertEqual(response.status_code, 404)
+
+
+class LoadIngredientsTest(TestCase):
+    """Загрузка ингредиентов из csv и json файлов."""
+
+    ROWS = [('Соль', 'г'), ('Сахар', 'г'), ('Молоко', 'мл')]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path):
+        call_command('load_ingredients', path, batch_size=2,
+                     stdout=io.StringIO())
+        return set(Ingredient.objects.values_list('name', 'units'))
+
+    def test_csv(self):
+        content = ''.join(f'{name},{units}\n' for name, units in self.ROWS)
+        path = self.write('ingredients.csv', content)
+        self.assertEqual(self.load(path), set(self.ROWS))
+        # Повторная загрузка не создает дубликатов.
+        self.assertEqual(self.load(path), set(self.ROWS))
+        self.assertEqual(Ingredient.objects.count(), len(self.ROWS))
+
+    @mock.patch('recipes.management.commands.load_ingredients.'
+                'READ_CHUNK_SIZE', 7)
+    def test_json(self):
+        content = json.dumps(
+            [{'name': name, 'measurement_unit': units}
+             for name, units in self.ROWS], ensure_ascii=False, indent=1)
+        path = self.write('ingredients.json', content)
+        self.assertEqual(self.load(path), set(self.ROWS))
+
+    def test_invalid_json(self):
+        path = self.write('ingredients.json', '[{"name": "Соль", ')
+        with self.assertRaises(CommandError):
+            self.load(path)
+
+
+class ImportExportRecipesTest(APITestCase):
+    """Загрузка рецептов из NDJSON и обратная выгрузка."""
+
+    ITEMS = [
+        {
+            'author': 'user1', 'name': 'Импортированный суп',
+            'text': 'Суп', 'cooking_time': 40,
+            'pub_date': '2023-01-02T03:04:05+00:00',
+            'tags': ['tag0', 'tag1'],
+            'ingredients': [
+                {'name': 'Ингредиент 0', 'measurement_unit': 'г',
+                 'amount': 3},
+                {'name': 'Новый ингредиент', 'measurement_unit': 'шт',
+                 'amount': 2},
+            ],
+            'image': None,
+        },
+        {
+            'author': 'user2', 'name': 'Импортированный салат',
+            'text': 'Салат', 'cooking_time': 10,
+            'pub_date': '2023-02-03T04:05:06+00:00',
+            'tags': ['tag2'],
+            'ingredients': [
+                {'name': 'Ингредиент 1', 'measurement_unit': 'г',
+                 'amount': 1},
+            ],
+            'image': None,
+        },
+    ]
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'recipes.ndjson')
+            with open(source, 'w', encoding='utf-8') as file:
+                # Повтор рецепта пропускается.
+                for item in [*self.ITEMS, self.ITEMS[0]]:
+                    file.write(json.dumps(item, ensure_ascii=False) + '\n')
+            output = io.StringIO()
+            call_command('import_recipes', source, stdout=output)
+            self.assertIn('Загружено рецептов: 2, пропущено: 1',
+                          output.getvalue())
+
+            target = os.path.join(directory, 'export.ndjson')
+            call_command('export_recipes', target, stderr=io.StringIO())
+            with open(target, encoding='utf-8') as file:
+                exported = [json.loads(line) for line in file]
+        names = {item['name'] for item in self.ITEMS}
+        self.assertEqual(
+            [item for item in exported if item['name'] in names],
+            self.ITEMS)
+        self.assertEqual(len(exported), self.RECIPES + len(self.ITEMS))
+        self.assertEqual(User.objects.get(username='user1').recipes_count,
+                         Recipe.objects.filter(author__username='user1')
+                         .count())
+
+
+class BenchmarkCompareTest(TestCase):
+    """Сравнение результатов benchmark_api с базовой линией."""
+
+    BASELINE = {'recipes': {'p95_ms': 10, 'queries': 4}}
+
+    def compare(self, result, tolerance=None):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(self.BASELINE, file)
+            file.flush()
+            command = BenchmarkCommand(stdout=io.StringIO())
+            command.compare({'recipes': result}, file.name, tolerance)
+
+    def test_queries(self):
+        self.compare({'p95_ms': 10, 'queries': 4})
+        with self.assertRaisesMessage(CommandError, 'запросов 4 -> 5'):
+            self.compare({'p95_ms': 10, 'queries': 5})
+
+    def test_p95_opt_in(self):
+        self.compare({'p95_ms': 100, 'queries': 4})
+        with self.assertRaisesMessage(CommandError, 'p95 10 -> 100'):
+            self.compare({'p95_ms': 100, 'queries': 4}, tolerance=0.25)
+
+
+class AsyncReadViewsTest(APITestCase):
+    """Асинхронные представления чтения отдают те же данные, что и
+       синхронные."""
+
+    def get_urls(self):
+        return [
+            '/api/recipes/', '/api/recipes/?limit=3&page=2',
+            '/api/recipes/?tags=tag1&tags=tag2',
+            f'/api/recipes/?author={self.users[1].id}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1&limit=2',
+            '/api/recipes/?cursor=&limit=5',
+            f'/api/recipes/{self.recipes[0].id}/',
+            '/api/tags/', f'/api/tags/{self.tags[0].id}/',
+            '/api/ingredients/', '/api/ingredients/?name=ингредиент',
+            f'/api/ingredients/{self.ingredients[0].id}/',
+        ]
+
+    def normalize(self, response):
+        data = response.json()
+        # Курсоры кодируют позицию, а не данные, и могут различаться.
+        if isinstance(data, dict) and 'next' in data and 'count' not in data:
+            data['next'] = bool(data['next'])
+            data['previous'] = bool(data['previous'])
+        return response.status_code, data
+
+    async def assert_same(self, url, headers):
+        await cache.aclear()
+        expected = self.normalize(
+            await sync_to_async(self.anonymous.get)(url, headers=headers))
+        await cache.aclear()
+        with override_settings(ROOT_URLCONF=__name__):
+            actual = self.normalize(
+                await AsyncClient().get(url, headers=headers))
+        self.assertEqual(actual, expected)
+
+    async def get_headers(self):
+        token = await Token.objects.acreate(user=self.user)
+        return {'Authorization': f'Token {token.key}'}
+
+    async def test_same_responses(self):
+        headers = await self.get_headers()
+        for url in self.get_urls():
+            for auth in ({}, headers):
+                with self.subTest(url=url, authenticated=bool(auth)):
+                    await self.assert_same(url, auth)
+
+    async def test_subscriptions(self):
+        headers = await self.get_headers()
+        for url in ('/api/users/subscriptions/',
+                    '/api/users/subscriptions/?recipes_limit=1&limit=1'):
+            with self.subTest(url=url):
+                await self.assert_same(url, headers)
+
+    async def test_not_found(self):
+        # Чтение выполняется вне транзакции, и DRF при ошибке помечает
+        # для отката транзакцию самого теста, если ATOMIC_REQUESTS
+        # включен.
+        with mock.patch.dict(connection.settings_dict,
+                             ATOMIC_REQUESTS=False):
+            for url in ('/api/recipes/?page=99', '/api/recipes/0/',
+                        '/api/tags/0/', '/api/ingredients/0/'):
+                with self.subTest(url=url):
+                    await self.assert_same(url, {})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_LAG_SECONDS=5,
+                   RECIPE_FILTER_INDEX=False)
+class PrimaryCookieTest(APITestCase):
+    """Cookie use_primary направляет чтение после записи в основную
+       БД."""
+
+    def test_read_database(self):
+        factory = RequestFactory()
+        self.assertEqual(get_read_database(factory.get('/')), 'replica')
+        self.assertIsNone(get_read_database(factory.post('/')))
+        factory.cookies[PRIMARY_COOKIE] = '1'
+        self.assertIsNone(get_read_database(factory.get('/')))
+
+    def test_cookie_after_write(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipes[1].id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        cookie = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertTrue(cookie['httponly'])
+        # Реплики в тестах нет, поэтому ответ возможен только при
+        # чтении из основной БД.
+        response = self.client.get(f'/api/recipes/{self.recipes[1].id}/')
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_failed_write_without_cookie(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipes[0].id}/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipes[1].id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+
+@override_settings(RECIPE_FILTER_INDEX_MAX_AGE=None)
+class RecipeFilterIndexTest(APITestCase):
+    """Фильтры ленты по индексу совпадают с фильтрацией в БД, в том
+       числе после изменений, внесенных в индекс сигналами."""
+
+    def get_filters(self):
+        tag0, tag1, tag2 = (tag.slug for tag in self.tags)
+        author = self.users[1].id
+        return [
+            {'tags': [tag0]},
+            {'tags': [tag1, tag2]},
+            {'tags': [tag2], 'author': author},
+            {'is_favorited': 1},
+            {'is_in_shopping_cart': 1},
+            {'is_favorited': 1, 'tags': [tag1]},
+            {'is_in_shopping_cart': 1, 'author': author},
+            {'is_favorited': 1, 'is_in_shopping_cart': 1, 'tags': [tag0]},
+            {'tags': [tag1], 'limit': 4, 'page': 2},
+        ]
+
+    def get_results(self, params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return (response.data['count'],
+                [item['id'] for item in response.data['results']])
+
+    def assert_same_results(self):
+        for params in self.get_filters():
+            params = {'limit': 100, **params}
+            with self.subTest(params=params):
+                with override_settings(RECIPE_FILTER_INDEX=False):
+                    expected = self.get_results(params)
+                with override_settings(RECIPE_FILTER_INDEX=True):
+                    self.assertEqual(self.get_results(params), expected)
+
+    def change(self, method, *args, **kwargs):
+        """Вносит изменение и проверяет, что индекс обновлен сигналами,
+           а не перестроен."""
+
+        snapshot = recipe_sets.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = method(*args, **kwargs)
+        # После записи через API cookie направляет чтение в БД.
+        self.client.cookies.clear()
+        self.assertIs(recipe_sets.get_current(), snapshot)
+        self.assert_same_results()
+        return response
+
+    def test_filters(self):
+        self.assert_same_results()
+
+    def test_create_recipe(self):
+        def create():
+            recipe = Recipe.objects.create(
+                author=self.users[1], name='Новый рецепт', text='Текст',
+                cooking_time=5)
+            recipe.tags.set([self.tags[1], self.tags[2]])
+        self.change(create)
+
+    def test_retag_recipe(self):
+        recipe = self.recipes[4]
+        self.change(recipe.tags.remove, self.tags[0])
+        self.change(recipe.tags.add, self.tags[2])
+        self.change(recipe.tags.clear)
+        self.change(self.tags[1].recipes.add, self.recipes[0])
+
+    def test_delete_recipe(self):
+        self.change(self.recipes[6].delete)
+
+    def test_toggle_favorite_and_cart(self):
+        recipe_id = self.recipes[1].id
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{recipe_id}/{action}/'
+            self.assertEqual(self.change(self.client.post, url)
+                             .status_code, 201)
+            self.assertEqual(self.change(self.client.delete, url)
+                             .status_code, 204)
+
+
+class ToggleLinksTest(APITestCase):
+    """Добавление и удаление избранного, корзины и подписок одним
+       запросом к таблице связей."""
+
+    def assert_toggle(self, url, counter, refresh):
+        before = getattr(refresh(), counter)
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(getattr(refresh(), counter), before + 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(getattr(refresh(), counter), before)
+
+    def test_favorite_and_cart(self):
+        recipe = self.recipes[1]
+        for action, counter in (('favorite', 'favorites_count'),
+                                ('shopping_cart', 'in_carts_count')):
+            with self.subTest(action=action):
+                self.assert_toggle(
+                    f'/api/recipes/{recipe.id}/{action}/', counter,
+                    lambda: Recipe.objects.get(pk=recipe.pk))
+
+    def test_subscribe(self):
+        author = self.users[2]
+        self.assert_toggle(
+            f'/api/users/{author.id}/subscribe/', 'followers_count',
+            lambda: User.objects.get(pk=author.pk))
+        response = self.client.post(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_recipe(self):
+        for method in (self.client.post, self.client.delete):
+            response = method('/api/recipes/0/favorite/')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['message'], 'Рецепт не найден')
+
+    def test_favorite_queries(self):
+        # Рецепт, вставка связи со счетчиком и точки сохранения
+        # транзакции запроса.
+        with self.assertNumQueries(5):
+            response = self.client.post(
+                f'/api/recipes/{self.recipes[1].id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.data),
+                         {'id', 'name', 'image', 'cooking_time'})
@@ -0,0 +1,97 @@
+from django.db import connections, router
+from django.db.models.signals import m2m_changed
+
+
+def get_link_sql(model, connection, fields):
+    """Возвращает колонки и значения полей для запроса к таблице
+       связи."""
+
+    columns, params = [], []
+    for name, value in fields.items():
+        field = model._meta.get_field(name)
+        columns.append(connection.ops.quote_name(field.column))
+        params.append(field.get_db_prep_save(value, connection))
+    return columns, params
+
+
+def send_links_changed(action, model, using, field, values, fields):
+    """Отправляет m2m_changed один раз для всех созданных или удаленных
+       связей, как add() и remove() поля многие-ко-многим, поэтому
+       получатели обновляют счетчики одним запросом на пачку.
+
+    Связи принадлежат одному объекту из fields, он передается как
+    instance, а pk_set содержит значения field.
+    """
+
+    if not values:
+        return
+    (name, value), = fields.items()
+    owner = model._meta.get_field(name).related_model
+    m2m_changed.send(
+        sender=model, instance=owner(pk=value), action=action,
+        reverse=False, model=model._meta.get_field(field).related_model,
+        pk_set=set(values), using=using)
+
+
+def add_links(model, field, values, **fields):
+    """Создает связи с объектами values одним запросом
+       INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    Строки создаются только для существующих объектов, уже имеющиеся
+    связи, в том числе созданные параллельным запросом, пропускаются.
+    Возвращает значения field созданных связей.
+    """
+
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    link = model._meta.get_field(field)
+    target = link.target_field
+    columns, params = get_link_sql(model, connection, fields)
+    column = quote_name(target.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            f'({", ".join(columns + [quote_name(link.column)])}) '
+            f'SELECT {"%s, " * len(params)}{column} '
+            f'FROM {quote_name(target.model._meta.db_table)} '
+            f'WHERE {column} IN ({", ".join(["%s"] * len(values))}) '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote_name(link.column)}',
+            params + [target.get_db_prep_save(value, connection)
+                      for value in values])
+        values = [value for value, in cursor.fetchall()]
+    send_links_changed('post_add', model, using, field, values, fields)
+    return values
+
+
+def remove_links(model, field, values, **fields):
+    """Удаляет связи с объектами values одним запросом
+       DELETE ... RETURNING.
+
+    Подходит для таблиц связей, на которые не ссылаются другие модели.
+    Возвращает значения field удаленных связей.
+    """
+
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    link = model._meta.get_field(field)
+    columns, params = get_link_sql(model, connection, fields)
+    conditions = [f'{column} = %s' for column in columns] + [
+        f'{quote_name(link.column)} IN '
+        f'({", ".join(["%s"] * len(values))})']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE {" AND ".join(conditions)} '
+            f'RETURNING {quote_name(link.column)}',
+            params + [link.get_db_prep_save(value, connection)
+                      for value in values])
+        values = [value for value, in cursor.fetchall()]
+    send_links_changed('post_remove', model, using, field, values, fields)
+    return values
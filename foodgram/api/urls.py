@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import with_async_reads
 from .views import (TagViewSet, RecipeViewSet, IngredientViewSet,
                     CustomUserViewSet)
 
@@ -12,9 +14,13 @@ router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
 router.register('users', CustomUserViewSet, basename='user')
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = with_async_reads(router_urls)
+
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('', include('djoser.urls.jwt')),
     path('auth/', include('djoser.urls.authtoken')),
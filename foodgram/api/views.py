@@ -1,11 +1,18 @@
-from django_filters.rest_framework import DjangoFilterBackend
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Exists, OuterRef
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+import csv
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Sum,
+                              Value, Window)
+from django.db.models import prefetch_related_objects
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from djoser.views import UserViewSet
-from rest_framework import filters, viewsets, permissions, status
+from rest_framework import viewsets, permissions, status
 from rest_framework import generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -13,13 +20,86 @@ from rest_framework.response import Response
 from .serializers import (RecipeShoppingCartSerializer, SubscriptionSerializer,
                           IngredientSerializer, RecipeFavoriteSerializer,
                           TagSerializer, RecipeReadSerializer,
-                          RecipeCreateSerializer)
+                          RecipeCreateSerializer, BatchIdsSerializer)
 from . import serializers
-from .filters import RecipeFilter
+from .autocomplete import ingredient_index
+from .filters import RecipeFilter, RecipeFilterBackend
+from .fragments import recipe_fragments
+from .membership import invalidate_membership
 from .permissions import AuthorAdminOrReadOnly
+from .replicas import ReplicaReadMixin
+from .renderers import (CSVRenderer, JSONShoppingListRenderer,
+                        PlainTextRenderer)
+from .snapshots import ingredients_payload, tags_payload
+from .toggles import add_links, remove_links
 from users.models import User, Subscription
 from recipes.models import (Ingredient, Tag, ShoppingCart, Favorite,
-                            IngredientAmount, Recipe)
+                            IngredientAmount, Recipe, ShoppingListItem)
+
+
+class EchoBuffer:
+    """Буфер, возвращающий записанное значение, для потокового csv."""
+
+    def write(self, value):
+        return value
+
+
+def parse_pk(model, pk):
+    """Приводит pk из url к типу первичного ключа модели или возвращает
+       None, если значение некорректно."""
+
+    try:
+        return model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+
+
+def get_link_recipe(recipe_id):
+    """Загружает поля рецепта, нужные для ответа на добавление в
+       избранное или корзину."""
+
+    if recipe_id is None:
+        return None
+    return Recipe.objects.only(
+        'id', 'name', 'image', 'cooking_time').filter(id=recipe_id).first()
+
+
+def batch_links(request, model, field, forbidden=(), **fields):
+    """Добавляет или удаляет пачку связей одним запросом к БД.
+
+    Возвращает статус каждого переданного id в порядке запроса.
+    Статус forbidden получают id, которые нельзя добавить.
+    """
+
+    serializer = BatchIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    if request.method == 'POST':
+        changed = set(add_links(
+            model, field, [pk for pk in ids if pk not in forbidden],
+            **fields))
+        done, skipped = 'added', 'already_added'
+    else:
+        changed = set(remove_links(model, field, ids, **fields))
+        done, skipped = 'removed', 'not_added'
+    if changed:
+        invalidate_membership(request)
+
+    rest = [pk for pk in ids if pk not in changed]
+    existing = set(model._meta.get_field(field).related_model.objects.filter(
+        pk__in=rest).values_list('pk', flat=True)) if rest else set()
+    results = []
+    for pk in ids:
+        if pk in changed:
+            result = done
+        elif pk not in existing:
+            result = 'not_found'
+        elif request.method == 'POST' and pk in forbidden:
+            result = 'forbidden'
+        else:
+            result = skipped
+        results.append({'id': pk, 'status': result})
+    return Response({'results': results}, status=status.HTTP_200_OK)
 
 
 class ManageFavorite:
@@ -34,66 +114,60 @@ class ManageFavorite:
     def favorite(self, request, pk):
         """Добавляет или удаляет из избранного."""
 
-        try:
-            instance = self.get_object()
-        except Http404:
-            return Response({'message': 'Рецепт не найден'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        instance = self.get_object()
-        content_type = ContentType.objects.get_for_model(instance)
+        recipe_id = parse_pk(Recipe, pk)
         if request.method == 'POST':
-            try:
-                Recipe.objects.get(id=instance.id)
-            except Recipe.DoesNotExist:
-                return Response(
-                    {'message': 'Переданный рецепт не существует'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            favorite_obj, created = Favorite.objects.get_or_create(
-                user=request.user,
-                content_type=content_type,
-                object_id=instance.id
-            )
-            if created:
-                favorite_obj.save()
-                serializer = RecipeFavoriteSerializer(
-                    instance,
-                    context={'request': request})
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            else:
+            instance = get_link_recipe(recipe_id)
+            if instance is None:
+                return Response({'message': 'Рецепт не найден'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not add_links(Favorite, 'recipe', [instance.id],
+                             user=request.user.id):
                 return Response(
                     {'message': 'Контент уже находится в избранном'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-
-        try:
-            favorite_obj = Favorite.objects.get(
-                user=request.user,
-                content_type=content_type,
-                object_id=instance.id
-            )
-            favorite_obj.delete()
+            invalidate_membership(request)
+            serializer = RecipeFavoriteSerializer(
+                instance,
+                context={'request': request})
+            return Response(serializer.data,
+                            status=status.HTTP_201_CREATED)
+
+        if recipe_id is not None and remove_links(
+                Favorite, 'recipe', [recipe_id], user=request.user.id):
+            invalidate_membership(request)
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except Favorite.DoesNotExist:
-            return Response(
-                {'message': 'Контент не находится в избранном'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        if recipe_id is None or not Recipe.objects.filter(
+                id=recipe_id).exists():
+            return Response({'message': 'Рецепт не найден'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'message': 'Контент не находится в избранном'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        """Добавляет или удаляет из избранного рецепты из списка ids."""
+
+        return batch_links(request, Favorite, 'recipe', user=request.user.id)
 
     def annotate_qs_is_favorite_field(self, queryset):
-        """Фильтрует избранные объекты."""
+        """Помечает объекты, добавленные пользователем в избранное."""
 
         if self.request.user.is_authenticated:
             is_favorite_subquery = Favorite.objects.filter(
-                object_id=OuterRef('pk'),
-                user=self.request.user,
-                content_type=ContentType.objects.get_for_model(queryset.model)
+                recipe=OuterRef('pk'),
+                user=self.request.user
             )
             queryset = queryset.annotate(
-                is_favorite=Exists(is_favorite_subquery))
+                is_favorited=Exists(is_favorite_subquery))
         return queryset
 
     @action(
@@ -105,7 +179,7 @@ class ManageFavorite:
     def favorites(self, request):
         """Выдает список избранных для текущего пользователя."""
 
-        queryset = self.get_queryset().filter(is_favorite=True)
+        queryset = self.get_queryset().filter(is_favorited=True)
         serializer_class = self.get_serializer_class()
         serializer = serializer_class(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -123,49 +197,65 @@ class ManageShopingCart:
     def shopping_cart(self, request, pk):
         """Добавляет или удаляет из корзины."""
 
-        try:
-            instance = self.get_object()
-        except Http404:
-            return Response({'message': 'Рецепт не найден'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        content_type = ContentType.objects.get_for_model(instance)
-
-        serializer = RecipeShoppingCartSerializer(instance,
-                                                  context={'request': request})
+        recipe_id = parse_pk(Recipe, pk)
         if request.method == 'POST':
-            shopping_cart_obj, created = ShoppingCart.objects.get_or_create(
-                user=request.user,
-                content_type=content_type,
-                object_id=instance.id
-            )
-
-            if created:
-                shopping_cart_obj.save()
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            else:
+            instance = get_link_recipe(recipe_id)
+            if instance is None:
+                return Response({'message': 'Рецепт не найден'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not add_links(ShoppingCart, 'recipe', [instance.id],
+                             user=request.user.id):
                 return Response(
                     {'message': 'Контент уже находится в корзине'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-
-        try:
-            shopping_cart_obj = ShoppingCart.objects.get(
-                user=request.user,
-                content_type=content_type,
-                object_id=instance.id
-            )
-            shopping_cart_obj.delete()
+            invalidate_membership(request)
+            serializer = RecipeShoppingCartSerializer(
+                instance,
+                context={'request': request})
+            return Response(serializer.data,
+                            status=status.HTTP_201_CREATED)
+
+        if recipe_id is not None and remove_links(
+                ShoppingCart, 'recipe', [recipe_id], user=request.user.id):
+            invalidate_membership(request)
             return Response(
                 {'message': 'Контент удален из корзины'},
                 status=status.HTTP_204_NO_CONTENT
             )
-        except ShoppingCart.DoesNotExist:
-            return Response(
-                {'message': 'Контент не находится в корзине'},
-                status=status.HTTP_400_BAD_REQUEST
+        if recipe_id is None or not Recipe.objects.filter(
+                id=recipe_id).exists():
+            return Response({'message': 'Рецепт не найден'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'message': 'Контент не находится в корзине'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        """Добавляет или удаляет из корзины рецепты из списка ids."""
+
+        return batch_links(request, ShoppingCart, 'recipe',
+                           user=request.user.id)
+
+    def annotate_qs_is_in_shopping_cart_field(self, queryset):
+        """Помечает объекты, добавленные пользователем в корзину."""
+
+        if self.request.user.is_authenticated:
+            is_in_shopping_cart_subquery = ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'),
+                user=self.request.user
             )
+            queryset = queryset.annotate(
+                is_in_shopping_cart=Exists(is_in_shopping_cart_subquery))
+        return queryset
 
 
 class UserList(generics.ListAPIView):
@@ -182,9 +272,11 @@ class UserDetail(generics.RetrieveAPIView):
     serializer_class = serializers.UserSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     """Определяет дополнителье REST методы для работы с пользователем."""
 
+    cursor_ordering = ('id',)
+
     def get_recipes_limit(self, request):
         param = request.query_params.get('recipes_limit')
         if not param:
@@ -198,76 +290,120 @@ class CustomUserViewSet(UserViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def get_subscription_recipes(self, recipes_limit):
+        """Возвращает не более recipes_limit последних рецептов каждого
+           автора, ограничивая выборку на стороне БД."""
+
+        recipes = Recipe.objects.all()
+        if recipes_limit:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author'),
+                    order_by=(F('pub_date').desc(), F('id').desc())
+                )
+            ).filter(row_number__lte=recipes_limit)
+        return recipes
+
+    def annotate_subscriptions(self, queryset, recipes_limit):
+        """Добавляет к авторам их последние рецепты."""
+
+        return queryset.annotate(
+            is_subscribed=Value(True)
+        ).prefetch_related(Prefetch(
+            'recipes', queryset=self.get_subscription_recipes(recipes_limit)
+        ))
+
     @action(methods=('get',), detail=False, permission_classes=(
             permissions.IsAuthenticated,))
     def subscriptions(self, request):
         """REST метод для вывода списка подписок."""
 
-        user = request.user
-        followings = User.objects.filter(following__user=user)
-        pages = self.paginate_queryset(followings)
-
         recipes_limit, err = self.get_recipes_limit(request)
         if err:
             return err
 
+        user = request.user
+        followings = self.annotate_subscriptions(
+            User.objects.filter(following__user=user), recipes_limit
+        ).order_by('id')
+        pages = self.paginate_queryset(followings)
+
         serializer = SubscriptionSerializer(
-            pages, many=True,
-            context={'request': request, 'limit': recipes_limit}
+            pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(methods=('post', 'delete'), detail=False, url_path='subscribe',
+            url_name='subscribe-batch',
+            permission_classes=(permissions.IsAuthenticated,))
+    def subscribe_batch(self, request):
+        """REST методы для подписки/отписки на авторов из списка ids."""
+
+        return batch_links(request, Subscription, 'author',
+                           forbidden={request.user.id}, user=request.user.id)
+
     @action(methods=('post', 'delete'), detail=True,
             permission_classes=(permissions.IsAuthenticated,))
     def subscribe(self, request, id):
         """REST методы для подписки/отписки."""
 
         user = request.user
-        author = get_object_or_404(User, id=id)
-
-        if request.method == 'POST':
-            if user.id == author.id:
-                return Response(
-                    {'error': 'Нельзя подписаться на себя'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            try:
-                Subscription.objects.get(user=user, author=author)
-                return Response(
-                    {'error': 'Вы уже подписаны на пользователя'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except Subscription.DoesNotExist:
-                pass
-
-            recipes_limit, err = self.get_recipes_limit(request)
-            if err:
-                return err
-
-            Subscription.objects.create(user=user, author=author)
-            serializer = SubscriptionSerializer(
-                author, context={'request': request, 'limit': recipes_limit})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
+        author_id = parse_pk(User, id)
         if request.method == 'DELETE':
-            subscription = Subscription.objects.filter(
-                user=user, author=author)
-            if subscription:
-                subscription.delete()
+            if author_id is not None and remove_links(
+                    Subscription, 'author', [author_id], user=user.id):
+                invalidate_membership(request)
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            if author_id is None or not User.objects.filter(
+                    id=author_id).exists():
+                raise Http404
             return Response(
                 {'error': 'Вы не подписаны на пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        author = get_object_or_404(User, id=author_id)
+        if user.id == author.id:
+            return Response(
+                {'error': 'Нельзя подписаться на себя'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipes_limit, err = self.get_recipes_limit(request)
+        if err:
+            return err
 
-class RecipeViewSet(viewsets.ModelViewSet, ManageFavorite, ManageShopingCart):
+        if not add_links(Subscription, 'author', [author.id], user=user.id):
+            return Response(
+                {'error': 'Вы уже подписаны на пользователя'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        invalidate_membership(request)
+        author.is_subscribed = True
+        prefetch_related_objects([author], Prefetch(
+            'recipes', queryset=self.get_subscription_recipes(recipes_limit)
+        ))
+        serializer = SubscriptionSerializer(
+            author, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+RECIPE_PREFETCH = (
+    'tags',
+    Prefetch('amounts',
+             queryset=IngredientAmount.objects.select_related('ingredient')),
+)
+
+
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet, ManageFavorite,
+                    ManageShopingCart):
     """Определяет все REST методы для работы с рецептами."""
 
     queryset = Recipe.objects.all()
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (RecipeFilterBackend,)
     permission_classes = (AuthorAdminOrReadOnly,)
     filterset_class = RecipeFilter
+    cursor_ordering = ('-pub_date', '-id')
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -285,61 +421,163 @@ class RecipeViewSet(viewsets.ModelViewSet, ManageFavorite, ManageShopingCart):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def build_recipes(self, recipes):
+        prefetch_related_objects(recipes, *RECIPE_PREFETCH)
+        return RecipeReadSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        ).data
+
+    def serialize_recipes(self, recipes):
+        return recipe_fragments.serialize(
+            recipes, self.request, self.build_recipes)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.serialize_recipes(list(queryset)))
+        return self.get_paginated_response(
+            self.serialize_recipes(list(page)))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize_recipes([self.get_object()])[0])
+
     def get_queryset(self):
-        queryset = Recipe.objects.all()
+        """Загружает рецепты вместе со связанными объектами и флагами
+           текущего пользователя за фиксированное число запросов."""
+
+        queryset = Recipe.objects.select_related('author')
+        if self.action not in ('list', 'retrieve'):
+            # Для чтения теги и ингредиенты загружаются только для
+            # рецептов, которых нет в кэше фрагментов.
+            queryset = queryset.prefetch_related(*RECIPE_PREFETCH)
         queryset = self.annotate_qs_is_favorite_field(queryset)
+        queryset = self.annotate_qs_is_in_shopping_cart_field(queryset)
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=self.request.user,
+                    author=OuterRef('author')
+                )
+            ))
         return queryset
 
     @action(methods=('get',), detail=False,
-            permission_classes=(permissions.IsAuthenticated,))
+            permission_classes=(permissions.IsAuthenticated,),
+            renderer_classes=(PlainTextRenderer, CSVRenderer,
+                              JSONShoppingListRenderer))
     def download_shopping_cart(self, request):
-        """Формирует и возвращает список покупок в txt формате."""
-
-        ingredients = IngredientAmount.objects\
-            .filter(recipe__shopping_cart__user=request.user)\
-            .values(
-                'ingredient__name',
-                'ingredient__units')\
-            .order_by('ingredient__name')\
-            .annotate(total_amount=Sum('amount'))
-
-        shopping_list = 'Cписок покупок:\n' + '\n'.join([
-            f'{ingredient["ingredient__name"]}'
-            f' - {ingredient["total_amount"]}'
-            f'({ingredient["ingredient__units"]})'
-            for ingredient in ingredients
-        ])
-
-        return self.build_txt(shopping_list)
-
-    def build_txt(self, shopping_list):
-        """Конструирует txt файл из списка ингрилиентов."""
-
-        filename = 'shopping_cart.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        """Потоково отдает список покупок в формате, переданном в
+           параметре format (txt, csv или json).
+
+        Суммы ингредиентов хранятся в ShoppingListItem. ETag вычисляется
+        по сводке списка одним агрегирующим запросом, а строки читаются
+        итератором только для ответа 200.
+        """
+
+        file_format = request.accepted_renderer.format
+        items = ShoppingListItem.objects.filter(user=request.user)
+        etag = self.get_shopping_cart_etag(items, file_format)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        ingredients = items.values(
+            'ingredient__name',
+            'ingredient__units',
+            total_amount=F('amount')
+        ).order_by('ingredient__name').iterator()
+        build = getattr(self, f'build_{file_format}')
+        response = StreamingHttpResponse(
+            build(ingredients),
+            content_type=(f'{request.accepted_renderer.media_type}; '
+                          f'charset=utf-8')
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_cart.{file_format}')
+        response['ETag'] = etag
         return response
 
+    def get_shopping_cart_etag(self, items, file_format):
+        """Вычисляет ETag по числу строк списка покупок, сумме
+           количеств и их контрольной сумме с весами id ингредиентов."""
 
-class IngredientsSearchFilter(filters.SearchFilter):
-    """Переопределяет название параметра поиска."""
-
-    search_param = 'name'
-
-
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+        summary = items.aggregate(
+            count=Count('id'),
+            total=Sum('amount'),
+            checksum=Sum(F('amount') * F('ingredient_id')),
+        )
+        digest = hashlib.md5(
+            f'{file_format}:{summary["count"]}:{summary["total"]}:'
+            f'{summary["checksum"]}'.encode()
+        ).hexdigest()
+        return quote_etag(digest)
+
+    def build_txt(self, ingredients):
+        """Построчно формирует txt файл из списка ингридиентов."""
+
+        yield 'Cписок покупок:'
+        for ingredient in ingredients:
+            yield (f'\n{ingredient["ingredient__name"]}'
+                   f' - {ingredient["total_amount"]}'
+                   f'({ingredient["ingredient__units"]})')
+
+    def build_csv(self, ingredients):
+        """Построчно формирует csv файл из списка ингридиентов."""
+
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((ingredient['ingredient__name'],
+                                   ingredient['ingredient__units'],
+                                   ingredient['total_amount']))
+
+    def build_json(self, ingredients):
+        """Поэлементно формирует json массив из списка ингридиентов."""
+
+        separator = ''
+        yield '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__units'],
+                'amount': ingredient['total_amount']
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Определяет REST методы для работы с рецептами."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = [IngredientsSearchFilter]
-    search_fields = ['^name']
+    filter_backends = ()
+    search_param = 'name'
+    search_limit = 50
+
+    def list(self, request, *args, **kwargs):
+        """Ищет ингредиенты по названию в индексе автодополнения без
+           обращения к БД, без параметра поиска выдает заранее
+           подготовленный список всех ингредиентов."""
 
+        name = request.query_params.get(self.search_param)
+        if not name:
+            return ingredients_payload.response(request)
+        serializer = self.get_serializer(
+            ingredient_index.search(name, self.search_limit), many=True)
+        return Response(serializer.data)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Определяет REST методы для работы с тегами."""
 
     queryset = Tag.objects.all()
     pagination_class = None
     serializer_class = TagSerializer
+
+    def list(self, request, *args, **kwargs):
+        """Выдает заранее подготовленный список тегов."""
+
+        return tags_payload.response(request)
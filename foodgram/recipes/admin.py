@@ -16,7 +16,7 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
     def in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class IngredientAmountInline(admin.TabularInline):
@@ -0,0 +1,64 @@
+from django.db.models import Count
+
+UPDATE_BATCH_SIZE = 1000
+
+
+def iter_drift(model, field, related, related_field):
+    """Сравнивает сохраненные значения счетчика с фактическими.
+
+    Оба набора читаются потоково в порядке первичного ключа одним
+    группирующим запросом каждый, поэтому память не зависит от размера
+    таблиц. Возвращает пары (pk, фактическое значение) для расхождений.
+    """
+
+    actual = related.order_by().values(related_field).annotate(
+        total=Count('pk')).order_by(related_field).values_list(
+        related_field, 'total').iterator()
+    stored = model.objects.order_by('pk').values_list(
+        'pk', field).iterator()
+    next_id, next_total = next(actual, (None, 0))
+    for pk, value in stored:
+        while next_id is not None and next_id < pk:
+            next_id, next_total = next(actual, (None, 0))
+        total = next_total if next_id == pk else 0
+        if value != total:
+            yield pk, total
+
+
+def reconcile_counter(model, field, related, related_field):
+    """Исправляет расхождения одного счетчика пачками bulk_update."""
+
+    fixed = 0
+    batch = []
+    for pk, total in iter_drift(model, field, related, related_field):
+        batch.append(model(pk=pk, **{field: total}))
+        if len(batch) == UPDATE_BATCH_SIZE:
+            model.objects.bulk_update(batch, (field,))
+            fixed += len(batch)
+            batch = []
+    model.objects.bulk_update(batch, (field,))
+    return fixed + len(batch)
+
+
+def reconcile_counters(apps):
+    """Пересчитывает денормализованные счетчики рецептов и пользователей.
+
+    Возвращает количество исправленных строк для каждого счетчика.
+    """
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+
+    counters = (
+        (Recipe, 'favorites_count', Favorite.objects.all(), 'recipe_id'),
+        (Recipe, 'in_carts_count', ShoppingCart.objects.all(), 'recipe_id'),
+        (User, 'recipes_count', Recipe.objects.all(), 'author'),
+        (User, 'followers_count', Subscription.objects.all(), 'author'),
+    )
+    return {
+        field: reconcile_counter(model, field, related, related_field)
+        for model, field, related, related_field in counters
+    }
@@ -0,0 +1,127 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = (1920, 1920)
+THUMBNAIL_SIZES = {
+    'thumb': (320, 320),
+    'medium': (800, 800),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def schedule_image_processing(recipe_id, image_name):
+    """Ставит обработку изображения рецепта в очередь пула потоков.
+
+    Если IMAGE_PROCESSING_WORKERS равен нулю, обрабатывает сразу.
+    """
+
+    if settings.IMAGE_PROCESSING_WORKERS:
+        get_executor().submit(run_in_thread, recipe_id, image_name)
+    else:
+        run_image_processing(recipe_id, image_name)
+
+
+def run_in_thread(recipe_id, image_name):
+    close_old_connections()
+    try:
+        run_image_processing(recipe_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def run_image_processing(recipe_id, image_name):
+    """Обрабатывает изображение, записывая ошибки в лог: сбой обработки
+       не должен влиять на сохранение рецепта."""
+
+    try:
+        process_recipe_image(recipe_id, image_name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+
+
+def encode(image, image_format, **options):
+    buffer = BytesIO()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Уменьшает исходное изображение, удаляет из него EXIF и сохраняет
+       миниатюры в JPEG и WebP, после чего удаляет прежние варианты."""
+
+    storage = Recipe._meta.get_field('image').storage
+    with storage.open(image_name) as file:
+        source = Image.open(file)
+        source_format = source.format or 'JPEG'
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info
+                              else 'RGB')
+    image.thumbnail(MAX_SIZE)
+
+    stem = os.path.splitext(image_name)[0]
+    extension = '.png' if source_format == 'PNG' else '.jpg'
+    main_name = storage.save(
+        f'{stem}_full{extension}',
+        encode(image, 'PNG' if extension == '.png' else 'JPEG',
+               quality=85, optimize=True)
+    )
+    variants = {
+        'source': main_name,
+        'webp': storage.save(
+            f'{stem}_full.webp', encode(image, 'WEBP', quality=80)),
+    }
+    for name, size in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size)
+        variants[name] = storage.save(
+            f'{stem}_{name}.jpg',
+            encode(thumbnail, 'JPEG', quality=80, optimize=True))
+        variants[f'{name}_webp'] = storage.save(
+            f'{stem}_{name}.webp', encode(thumbnail, 'WEBP', quality=75))
+
+    with transaction.atomic():
+        recipes = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, image=image_name)
+        previous = recipes.values_list('image_variants', flat=True).first()
+        if previous is None:
+            delete_files(storage, variants.values())
+            return
+        recipes.update(image=main_name, image_variants=variants,
+                       cache_version=F('cache_version') + 1)
+        # Прежние варианты отдаются до фиксации новых и удаляются после.
+        transaction.on_commit(partial(
+            delete_files, storage,
+            [image_name, *set(previous.values()) - set(variants.values())]))
+
+
+def delete_files(storage, names):
+    for name in set(names):
+        storage.delete(name)
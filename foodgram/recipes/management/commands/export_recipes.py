@@ -0,0 +1,78 @@
+import base64
+import json
+import sys
+import time
+
+from django.core.management import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientAmount, Recipe
+
+
+def serialize_recipe(recipe, embed_images):
+    """Представляет рецепт в виде словаря с естественными ключами
+       автора, тегов и ингредиентов."""
+
+    item = {
+        'author': recipe.author.username,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': amount.ingredient.name,
+                'measurement_unit': amount.ingredient.units,
+                'amount': amount.amount,
+            }
+            for amount in recipe.amounts.all()
+        ],
+        'image': recipe.image.name or None,
+    }
+    if embed_images and recipe.image:
+        with recipe.image.open('rb') as file:
+            item['image_data'] = base64.b64encode(file.read()).decode()
+    return item
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в формате NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Путь к файлу, по умолчанию stdout')
+        parser.add_argument(
+            '--embed-images', action='store_true',
+            help='Включить содержимое изображений в base64')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Количество рецептов, загружаемых из БД за раз')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'amounts',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            )
+        ).order_by('id')
+
+        path = options['path']
+        file = (sys.stdout if path == '-'
+                else open(path, 'w', encoding='utf-8'))
+        started = time.monotonic()
+        total = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                file.write(json.dumps(
+                    serialize_recipe(recipe, options['embed_images']),
+                    ensure_ascii=False) + '\n')
+                total += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(
+            f'Выгружено рецептов: {total} за '
+            f'{time.monotonic() - started:.1f} с')
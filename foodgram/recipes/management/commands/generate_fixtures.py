@@ -0,0 +1,177 @@
+import random
+import time
+from itertools import accumulate
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+
+from recipes.counters import reconcile_counters
+from recipes.shopping_lists import rebuild_shopping_lists
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+from .load_ingredients import batches
+
+DEFAULT_PASSWORD = 'fixtures-password'
+
+
+class ZipfSampler:
+    """Выбирает элементы с вероятностью, обратной степени их ранга."""
+
+    def __init__(self, rng, population, exponent=1.1):
+        self.rng = rng
+        self.population = list(population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+
+    def choice(self):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights)[0]
+
+    def sample(self, count, exclude=None):
+        """Возвращает до count различных элементов."""
+
+        count = min(count, len(self.population) - (exclude is not None))
+        result = set()
+        attempts = count * 10
+        while len(result) < count and attempts:
+            item = self.choice()
+            if item != exclude:
+                result.add(item)
+            attempts -= 1
+        return result
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических пользователей, рецептов, избранного, '
+            'корзин и подписок для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument(
+            '--subscriptions-per-user', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='fixture',
+            help='Префикс имен пользователей и рецептов')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        prefix = f'{options["prefix"]}{options["seed"]}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже созданы, '
+                f'укажите другой --seed или --prefix.')
+
+        tag_ids = self.create_tags(options['tags'])
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните load_ingredients.')
+        self.rng.shuffle(ingredient_ids)
+
+        user_ids = self.create_users(prefix, options['users'])
+        recipe_ids = self.create_recipes(
+            prefix, options['recipes'], user_ids,
+            ZipfSampler(self.rng, tag_ids),
+            ZipfSampler(self.rng, ingredient_ids),
+            options['tags_per_recipe'], options['ingredients_per_recipe'])
+
+        self.rng.shuffle(recipe_ids)
+        recipes = ZipfSampler(self.rng, recipe_ids)
+        for model, per_user in ((Favorite, options['favorites_per_user']),
+                                (ShoppingCart, options['cart_per_user'])):
+            self.insert(model, (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipes.sample(per_user)
+            ))
+
+        authors = ZipfSampler(self.rng, user_ids)
+        self.insert(Subscription, (
+            Subscription(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in authors.sample(
+                options['subscriptions_per_user'], exclude=user_id)
+        ))
+
+        reconcile_counters(apps)
+        rebuild_shopping_lists(apps)
+        self.stdout.write(self.style.SUCCESS(
+            f'Генерация завершена за {time.monotonic() - self.started:.1f} с'))
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками и возвращает их id."""
+
+        ids = []
+        total = 0
+        for batch in batches(objects, self.batch_size):
+            ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+            total += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {total}, '
+                f'{time.monotonic() - self.started:.1f} с')
+        return ids
+
+    def create_tags(self, count):
+        existing = Tag.objects.count()
+        Tag.objects.bulk_create([
+            Tag(name=f'Тег {number}', slug=f'tag-{number}',
+                color=f'#{self.rng.randrange(0x1000000):06x}')
+            for number in range(existing, count)
+        ], ignore_conflicts=True)
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def create_users(self, prefix, count):
+        password = make_password(DEFAULT_PASSWORD)
+        return self.insert(User, (
+            User(username=f'{prefix}{number}',
+                 email=f'{prefix}{number}@example.com',
+                 first_name='Имя', last_name='Фамилия',
+                 password=password)
+            for number in range(count)
+        ))
+
+    def create_recipes(self, prefix, count, user_ids, tags, ingredients,
+                       tags_per_recipe, ingredients_per_recipe):
+        authors = ZipfSampler(self.rng, user_ids)
+        RecipeTag = Recipe.tags.through
+        created = []
+        for numbers in batches(range(count), self.batch_size):
+            recipes = Recipe.objects.bulk_create([
+                Recipe(author_id=authors.choice(),
+                       name=f'{prefix}рецепт {number}',
+                       text=f'Описание рецепта {number}',
+                       cooking_time=self.rng.randint(5, 180))
+                for number in numbers
+            ])
+            RecipeTag.objects.bulk_create([
+                RecipeTag(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in tags.sample(tags_per_recipe)
+            ])
+            IngredientAmount.objects.bulk_create([
+                IngredientAmount(recipe_id=recipe.pk, ingredient_id=ingredient,
+                                 amount=self.rng.randint(1, 500))
+                for recipe in recipes
+                for ingredient in ingredients.sample(ingredients_per_recipe)
+            ])
+            created.extend(recipe.pk for recipe in recipes)
+            self.stdout.write(
+                f'Рецепты: {len(created)}, '
+                f'{time.monotonic() - self.started:.1f} с')
+        return created
@@ -0,0 +1,178 @@
+import base64
+import json
+import os
+import time
+from multiprocessing import get_context
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.counters import reconcile_counters
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+from .load_ingredients import batches
+
+
+def resolve_ingredients(keys):
+    """Возвращает id ингредиентов по парам (название, единицы),
+       создавая недостающие одной вставкой."""
+
+    def fetch():
+        return {
+            (name, units): pk for pk, name, units in
+            Ingredient.objects.filter(name__in={name for name, _ in keys})
+            .values_list('id', 'name', 'units')
+        }
+
+    ingredients = fetch()
+    missing = keys - ingredients.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, units=units) for name, units in missing],
+            ignore_conflicts=True
+        )
+        ingredients = fetch()
+    return ingredients
+
+
+def load_image(item):
+    """Сохраняет встроенное изображение или возвращает путь к уже
+       перенесенному файлу."""
+
+    if not item.get('image_data'):
+        return item.get('image') or ''
+    storage = Recipe._meta.get_field('image').storage
+    return storage.save(
+        f'recipes/{os.path.basename(item["image"])}',
+        ContentFile(base64.b64decode(item['image_data']))
+    )
+
+
+def import_batch(lines):
+    """Импортирует пачку рецептов фиксированным числом запросов.
+
+    Рецепты, автор которых не найден или которые уже существуют,
+    пропускаются. Связи рецепта, параллельно вставленного другим
+    процессом, добавляются к нему без дубликатов. Возвращает
+    количество добавленных и пропущенных.
+    """
+
+    items = [json.loads(line) for line in lines]
+    with transaction.atomic():
+        authors = User.objects.in_bulk(
+            {item['author'] for item in items}, field_name='username')
+        existing = set(Recipe.objects.filter(
+            author__in=authors.values(),
+            name__in={item['name'] for item in items}
+        ).values_list('author_id', 'name'))
+        tags = dict(Tag.objects.filter(
+            slug__in={slug for item in items for slug in item['tags']}
+        ).values_list('slug', 'id'))
+        ingredients = resolve_ingredients({
+            (ingredient['name'], ingredient['measurement_unit'])
+            for item in items for ingredient in item['ingredients']
+        })
+
+        recipes, imported_items = [], []
+        for item in items:
+            author = authors.get(item['author'])
+            if author is None or (author.id, item['name']) in existing:
+                continue
+            existing.add((author.id, item['name']))
+            recipe = Recipe(
+                author=author,
+                name=item['name'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+                image=load_image(item),
+            )
+            recipes.append(recipe)
+            imported_items.append(item)
+        # Тот же рецепт может одновременно вставлять другой процесс,
+        # поэтому конфликты пропускаются, а id читаются заново.
+        Recipe.objects.bulk_create(recipes, ignore_conflicts=True)
+        ids = {
+            (author_id, name): pk for pk, author_id, name in
+            Recipe.objects.filter(
+                author__in=authors.values(),
+                name__in={recipe.name for recipe in recipes}
+            ).values_list('id', 'author_id', 'name')
+        }
+        pairs = []
+        for recipe, item in zip(recipes, imported_items):
+            recipe.id = ids.get((recipe.author_id, recipe.name))
+            if recipe.id is not None:
+                pairs.append((recipe, item))
+
+        dated = []
+        for recipe, item in pairs:
+            pub_date = parse_datetime(item.get('pub_date') or '')
+            if pub_date is not None:
+                recipe.pub_date = pub_date
+                dated.append(recipe)
+        Recipe.objects.bulk_update(dated, ('pub_date',), batch_size=1000)
+
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe_id=recipe.id, tag_id=tags[slug])
+            for recipe, item in pairs for slug in set(item['tags'])
+            if slug in tags
+        ], batch_size=1000, ignore_conflicts=True)
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[(ingredient['name'],
+                                           ingredient['measurement_unit'])],
+                amount=ingredient['amount']
+            )
+            for recipe, item in pairs for ingredient in item['ingredients']
+        ], batch_size=1000, ignore_conflicts=True)
+    return len(pairs), len(items) - len(pairs)
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из NDJSON файла, созданного export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к NDJSON файлу')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов в одной транзакции')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество параллельных процессов')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        imported = skipped = 0
+        with open(options['path'], 'r', encoding='utf-8') as file:
+            chunks = batches(
+                (line for line in file if line.strip()),
+                options['batch_size']
+            )
+            if options['workers'] > 1:
+                connections.close_all()
+                pool = get_context('fork').Pool(options['workers'])
+                results = pool.imap_unordered(import_batch, chunks)
+            else:
+                pool = None
+                results = map(import_batch, chunks)
+            try:
+                for batch_imported, batch_skipped in results:
+                    imported += batch_imported
+                    skipped += batch_skipped
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'Загружено рецептов: {imported}, '
+                        f'пропущено: {skipped}, '
+                        f'{imported / elapsed:.0f} рецептов/с')
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        reconcile_counters(apps)
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.models import Ingredient
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Построчно читает ингредиенты из csv файла вида name,units."""
+
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоково читает ингредиенты из json массива объектов с полями
+       name и measurement_unit, не загружая файл в память целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный json файл.')
+                break
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Загрузка ингредиентов из csv или json файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='ingredients.csv',
+            help='Путь к файлу с ингредиентами')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной вставке')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+
+        started = time.monotonic()
+        existing = Ingredient.objects.count()
+        total = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = READERS[file_format](file)
+            for batch in batches(rows, options['batch_size']):
+                Ingredient.objects.bulk_create(
+                    [Ingredient(name=name, units=units)
+                     for name, units in batch],
+                    ignore_conflicts=True
+                )
+                total += len(batch)
+                self.stdout.write(
+                    f'Обработано строк: {total}, '
+                    f'{total / (time.monotonic() - started):.0f} строк/с')
+        created = Ingredient.objects.count() - existing
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена. Добавлено ингредиентов: {created}, '
+            f'уже существовало: {total - created}.'))
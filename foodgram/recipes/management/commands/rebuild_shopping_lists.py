@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_lists import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчет списков покупок всех пользователей по их корзинам'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            created = rebuild_shopping_lists(apps)
+        self.stdout.write(f'Строк списков покупок: {created}')
+        self.stdout.write(self.style.SUCCESS('Пересчет завершен.'))
@@ -0,0 +1,16 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, корзины, рецептов и подписчиков'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            fixed = reconcile_counters(apps)
+        for field, count in fixed.items():
+            self.stdout.write(f'{field}: исправлено строк - {count}')
+        self.stdout.write(self.style.SUCCESS('Пересчет завершен.'))
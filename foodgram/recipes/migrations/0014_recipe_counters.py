@@ -0,0 +1,60 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+
+    recipe_type = ContentType.objects.filter(
+        app_label='recipes', model='recipe').first()
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            Favorite.objects.filter(content_type=recipe_type), 'object_id'),
+        in_carts_count=count_subquery(
+            ShoppingCart.objects.filter(content_type=recipe_type),
+            'object_id'),
+    )
+    User.objects.update(
+        recipes_count=count_subquery(Recipe.objects, 'author'),
+        followers_count=count_subquery(Subscription.objects, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_search_vector'),
+        ('users', '0006_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
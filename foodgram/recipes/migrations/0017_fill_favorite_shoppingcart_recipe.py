@@ -0,0 +1,62 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import F
+
+BATCH_SIZE = 1000
+
+MODELS = ('Favorite', 'ShoppingCart')
+
+
+def get_recipe_type(apps):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    return ContentType.objects.get_or_create(
+        app_label='recipes', model='recipe')[0]
+
+
+def copy_in_batches(model, **fields):
+    """Обновляет строки пачками по первичному ключу, а не всю таблицу
+       одним долгим запросом."""
+
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        if not batch:
+            return
+        model.objects.filter(pk__in=batch).update(**fields)
+        last_pk = batch[-1]
+
+
+def fill_recipe(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipe_type = get_recipe_type(apps)
+    for name in MODELS:
+        model = apps.get_model('recipes', name)
+        model.objects.exclude(
+            content_type=recipe_type,
+            object_id__in=Recipe.objects.values('pk'),
+        ).delete()
+        copy_in_batches(model, recipe_id=F('object_id'))
+
+
+def fill_content_object(apps, schema_editor):
+    recipe_type = get_recipe_type(apps)
+    for name in MODELS:
+        copy_in_batches(apps.get_model('recipes', name),
+                        content_type=recipe_type, object_id=F('recipe_id'))
+
+
+class Migration(migrations.Migration):
+    # Каждая пачка фиксируется отдельно, чтобы не держать блокировки
+    # всех строк до конца миграции. Повторный запуск после сбоя
+    # заполняет поля заново.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0016_favorite_shoppingcart_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_recipe, fill_content_object),
+    ]
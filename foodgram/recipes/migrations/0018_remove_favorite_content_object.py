@@ -0,0 +1,56 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_fill_favorite_shoppingcart_recipe'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='favorite',
+            name='unique_user_content_type_object_id',
+        ),
+        migrations.RemoveConstraint(
+            model_name='shoppingcart',
+            name='unique_shopping_cart_user_content_type_object_id',
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.RemoveField(
+            model_name='favorite',
+            name='content_type',
+        ),
+        migrations.RemoveField(
+            model_name='favorite',
+            name='object_id',
+        ),
+        migrations.RemoveField(
+            model_name='shoppingcart',
+            name='content_type',
+        ),
+        migrations.RemoveField(
+            model_name='shoppingcart',
+            name='object_id',
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart_user_recipe'),
+        ),
+    ]
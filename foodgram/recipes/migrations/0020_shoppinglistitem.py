@@ -0,0 +1,61 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:00
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+
+    totals = ShoppingCart.objects.filter(
+        recipe__amounts__isnull=False
+    ).values_list(
+        'user_id', 'recipe__amounts__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__amounts__amount')
+    ).order_by().iterator()
+    while True:
+        batch = [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                             amount=total)
+            for user_id, ingredient_id, total in islice(totals, BATCH_SIZE)
+        ]
+        if not batch:
+            return
+        ShoppingListItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0019_recipe_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(default=0, verbose_name='Количество ингредиента')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Строка списка покупок',
+                'verbose_name_plural': 'Строки списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_user_ingredient'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
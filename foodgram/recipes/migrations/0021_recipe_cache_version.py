@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия кэша представления'),
+        ),
+    ]
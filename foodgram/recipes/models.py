@@ -1,11 +1,10 @@
-from django.contrib.contenttypes.fields import GenericForeignKey
-from django.contrib.contenttypes.fields import GenericRelation
-from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.validators import RegexValidator
 from django.db import models
 
-from users.models import User
+from users.models import DenormalizedFieldsMixin, User
 
 
 class Achievement(models.Model):
@@ -74,9 +73,12 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.units}'
 
 
-class Recipe(models.Model):
+class Recipe(DenormalizedFieldsMixin, models.Model):
     """Модель для описания рецепта."""
 
+    denormalized_fields = ('favorites_count', 'in_carts_count',
+                           'cache_version')
+
     author = models.ForeignKey(
         User,
         verbose_name='Автор рецепта',
@@ -96,6 +98,11 @@ class Recipe(models.Model):
         upload_to='recipes/',
         blank=True,
     )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        editable=False,
+    )
     text = models.TextField(
         'Описание рецепта',
     )
@@ -117,8 +124,26 @@ class Recipe(models.Model):
                 30000, message='Время  не должно быть больше 30000 минут')
         )
     )
-    favorites = GenericRelation('Favorite')
-    shopping_cart = GenericRelation('ShoppingCart')
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    cache_version = models.PositiveIntegerField(
+        'Версия кэша представления',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-pub_date']
@@ -131,6 +156,13 @@ class Recipe(models.Model):
                 name='unique_reipe_author',
             ),
         )
+        indexes = (
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -140,9 +172,12 @@ class ShoppingCart(models.Model):
     """Модель для формирования покупок."""
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey('content_type', 'object_id')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart',
+        verbose_name='Рецепт'
+    )
 
     class Meta:
         ordering = ['-id']
@@ -150,22 +185,66 @@ class ShoppingCart(models.Model):
         verbose_name_plural = 'Списки покупок'
         constraints = [
             models.UniqueConstraint(
-                fields=['user', 'object_id', 'content_type'],
-                name='unique_shopping_cart_user_content_type_object_id'
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart_user_recipe'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.recipe.name}'
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммы ингредиента в корзине пользователя.
+
+    Суммы изменяются при добавлении и удалении рецептов из корзины и
+    при редактировании ингредиентов рецептов в корзине через API.
+    Сохранение и удаление IngredientAmount суммы не меняет, поэтому
+    после изменения ингредиентов рецептов в обход API (в shell или
+    пачками в БД) нужно выполнить команду rebuild_shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        'Количество ингредиента',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_user_ingredient'
             )
         ]
 
     def __str__(self):
-        return f'{self.user.username} - {self.content_type.name}'
+        return f'{self.user.username} - {self.ingredient.name}'
 
 
 class Favorite(models.Model):
     """Модель для создания избранного."""
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey('content_type', 'object_id')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='favorites',
+        verbose_name='Рецепт'
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -173,13 +252,13 @@ class Favorite(models.Model):
         ordering = ['-id']
         constraints = [
             models.UniqueConstraint(
-                fields=['user', 'object_id', 'content_type'],
-                name='unique_user_content_type_object_id'
+                fields=['user', 'recipe'],
+                name='unique_favorite_user_recipe'
             )
         ]
 
     def __str__(self):
-        return f'{self.user.username} - {self.content_type.name}'
+        return f'{self.user.username} - {self.recipe.name}'
 
 
 class AchievementTag(models.Model):
@@ -0,0 +1,104 @@
+from itertools import islice
+
+from django.db import connections, router
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import IngredientAmount, ShoppingCart, ShoppingListItem
+
+INSERT_BATCH_SIZE = 1000
+
+
+def add_recipes(recipe_ids, user_id=None):
+    """Прибавляет ингредиенты рецептов к спискам покупок пользователя
+       user_id или всех пользователей, у которых рецепты в корзине.
+
+    Суммы изменяются одним запросом INSERT ... ON CONFLICT DO UPDATE,
+    поэтому параллельные изменения одной строки не теряются.
+    """
+
+    if not recipe_ids:
+        return
+    using = router.db_for_write(ShoppingListItem)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    item = quote_name(ShoppingListItem._meta.db_table)
+    amounts = quote_name(IngredientAmount._meta.db_table)
+    carts = quote_name(ShoppingCart._meta.db_table)
+    params = list(recipe_ids)
+    user_condition = ''
+    if user_id is not None:
+        user_condition = 'AND cart.user_id = %s '
+        params.append(user_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {item} (user_id, ingredient_id, amount) '
+            f'SELECT cart.user_id, recipe_amount.ingredient_id, '
+            f'SUM(recipe_amount.amount) '
+            f'FROM {amounts} recipe_amount '
+            f'JOIN {carts} cart '
+            f'ON cart.recipe_id = recipe_amount.recipe_id '
+            f'WHERE recipe_amount.recipe_id IN '
+            f'({", ".join(["%s"] * len(recipe_ids))}) {user_condition}'
+            f'GROUP BY cart.user_id, recipe_amount.ingredient_id '
+            f'ON CONFLICT (user_id, ingredient_id) '
+            f'DO UPDATE SET amount = {item}.amount + EXCLUDED.amount',
+            params)
+
+
+def remove_recipes(recipe_ids, user_id=None):
+    """Вычитает ингредиенты рецептов из списков покупок пользователя
+       user_id или всех пользователей, у которых рецепты в корзине, и
+       удаляет обнулившиеся строки."""
+
+    if not recipe_ids:
+        return
+    amounts = IngredientAmount.objects.filter(recipe_id__in=recipe_ids)
+    items = ShoppingListItem.objects.filter(
+        ingredient_id__in=amounts.values('ingredient_id'))
+    totals = amounts.filter(ingredient_id=OuterRef('ingredient_id'))
+    if user_id is None:
+        items = items.filter(user_id__in=ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids).values('user_id'))
+        # Каждому пользователю вычитаются только рецепты его корзины.
+        totals = totals.filter(
+            recipe__shopping_cart__user_id=OuterRef('user_id'))
+    else:
+        items = items.filter(user_id=user_id)
+    items.update(amount=Greatest(F('amount') - Coalesce(Subquery(
+        totals.values('ingredient_id').annotate(
+            total=Sum('amount')).values('total')
+    ), 0), 0))
+    items.filter(amount=0).delete()
+
+
+def rebuild_shopping_lists(apps):
+    """Пересчитывает списки покупок всех пользователей по корзинам.
+
+    Суммы читаются потоково одним группирующим запросом и вставляются
+    пачками bulk_create. Возвращает количество строк списков.
+    """
+
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+
+    ShoppingListItem.objects.all().delete()
+    totals = ShoppingCart.objects.filter(
+        recipe__amounts__isnull=False
+    ).values_list(
+        'user_id', 'recipe__amounts__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__amounts__amount')
+    ).order_by().iterator()
+    created = 0
+    while True:
+        batch = [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                             amount=total)
+            for user_id, ingredient_id, total in islice(
+                totals, INSERT_BATCH_SIZE)
+        ]
+        if not batch:
+            return created
+        ShoppingListItem.objects.bulk_create(batch)
+        created += len(batch)
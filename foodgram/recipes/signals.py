@@ -0,0 +1,200 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import User
+from . import shopping_lists
+from .images import schedule_image_processing
+from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingCart, Tag)
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+# Поля пользователя, входящие в представление рецептов его авторства.
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    """Увеличивает счетчик добавлений рецепта в избранное или корзину."""
+
+    if created:
+        field = COUNTERS[sender]
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{field: F(field) + 1})
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """Уменьшает счетчик добавлений рецепта в избранное или корзину."""
+
+    field = COUNTERS[sender]
+    Recipe.objects.filter(pk=instance.recipe_id, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1})
+
+
+@receiver(m2m_changed, sender=Favorite)
+@receiver(m2m_changed, sender=ShoppingCart)
+def update_recipe_counters(sender, action, pk_set, **kwargs):
+    """Изменяет счетчики рецептов пачки связей, созданных или удаленных
+       одним запросом, одним обновлением."""
+
+    field = COUNTERS[sender]
+    recipes = Recipe.objects.filter(pk__in=pk_set)
+    if action == 'post_add':
+        recipes.update(**{field: F(field) + 1})
+    elif action == 'post_remove':
+        recipes.filter(**{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    """Прибавляет ингредиенты рецепта к списку покупок пользователя."""
+
+    if created:
+        shopping_lists.add_recipes([instance.recipe_id], instance.user_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, origin=None,
+                                     **kwargs):
+    """Вычитает ингредиенты рецепта из списка покупок пользователя.
+
+    При каскадном удалении рецепта ингредиенты могут быть удалены
+    раньше корзины, поэтому их вычитает remove_deleted_recipe, а список
+    удаляемого пользователя удаляется вместе с ним.
+    """
+
+    origin_model = (origin.model if isinstance(origin, QuerySet)
+                    else type(origin))
+    if origin is None or origin_model is ShoppingCart:
+        shopping_lists.remove_recipes([instance.recipe_id],
+                                      instance.user_id)
+
+
+@receiver(m2m_changed, sender=ShoppingCart)
+def update_shopping_list(sender, instance, action, pk_set, **kwargs):
+    """Прибавляет или вычитает ингредиенты пачки рецептов, добавленных
+       в корзину или удаленных из нее одним запросом."""
+
+    if action == 'post_add':
+        shopping_lists.add_recipes(list(pk_set), instance.pk)
+    elif action == 'post_remove':
+        shopping_lists.remove_recipes(list(pk_set), instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe(sender, instance, **kwargs):
+    """Вычитает ингредиенты удаляемого рецепта из списков покупок."""
+
+    shopping_lists.remove_recipes([instance.id])
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    """Увеличивает счетчик рецептов автора."""
+
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    """Уменьшает счетчик рецептов автора."""
+
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F('recipes_count') - 1)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    """Ставит новое изображение рецепта в очередь на обработку после
+       фиксации транзакции."""
+
+    if instance.image and (
+            instance.image.name != instance.image_variants.get('source')):
+        transaction.on_commit(partial(
+            schedule_image_processing, instance.pk, instance.image.name))
+
+
+def bump_cache_version(recipes):
+    """Увеличивает версию кэша представления рецептов, после чего
+       закэшированные фрагменты больше не читаются."""
+
+    recipes.update(cache_version=F('cache_version') + 1)
+
+
+@receiver(post_save, sender=Recipe)
+def bump_recipe_cache_version(sender, instance, created, **kwargs):
+    """Сбрасывает кэш представления измененного рецепта.
+
+    Ингредиенты рецепта удаляются и изменяются пачками при его
+    редактировании, поэтому версия увеличивается при сохранении рецепта
+    в той же транзакции.
+    """
+
+    if not created:
+        bump_cache_version(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=IngredientAmount)
+def bump_amount_cache_version(sender, instance, **kwargs):
+    """Сбрасывает кэш представления рецепта с измененным
+       ингредиентом."""
+
+    bump_cache_version(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_tagged_cache_version(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Сбрасывает кэш представления рецептов, у которых изменились
+       теги."""
+
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version(Recipe.objects.filter(pk=instance.pk))
+    elif reverse and action in ('post_add', 'post_remove'):
+        bump_cache_version(Recipe.objects.filter(pk__in=pk_set))
+    elif reverse and action == 'pre_clear':
+        bump_cache_version(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_tag_cache_version(sender, instance, created=False, **kwargs):
+    """Сбрасывает кэш представления рецептов с измененным тегом."""
+
+    if not created:
+        bump_cache_version(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_cache_version(sender, instance, created=False, **kwargs):
+    """Сбрасывает кэш представления рецептов с измененным
+       ингредиентом."""
+
+    if not created:
+        bump_cache_version(
+            Recipe.objects.filter(amounts__ingredient=instance))
+
+
+@receiver(post_save, sender=User)
+def bump_author_cache_version(sender, instance, created, update_fields,
+                              **kwargs):
+    """Сбрасывает кэш представления рецептов автора после изменения
+       его данных, кроме служебных полей вроде last_login."""
+
+    if not created and (update_fields is None
+                        or AUTHOR_FIELDS.intersection(update_fields)):
+        bump_cache_version(Recipe.objects.filter(author=instance))
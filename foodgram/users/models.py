@@ -26,9 +26,34 @@ class CustomAccounManager(BaseUserManager):
         return self._create_user(email, password, **extra_fields)
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    """Исключает из save() поля, которые изменяются только запросами
+       update() с F выражениями.
+
+    Иначе сохранение загруженного ранее объекта записало бы поверх
+    параллельных изменений устаревшие значения из памяти.
+    """
+
+    denormalized_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            update_fields = [name for name in update_fields
+                             if name not in self.denormalized_fields]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     """Модель для пользователей."""
 
+    denormalized_fields = ('recipes_count', 'followers_count')
+
     username = models.CharField(
         'Логин',
         max_length=150,
@@ -58,6 +83,16 @@ class User(AbstractUser):
         max_length=150,
         blank=False,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+    )
     objects = CustomAccounManager()
 
     class Meta:
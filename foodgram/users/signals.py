@@ -0,0 +1,35 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    """Увеличивает счетчик подписчиков автора."""
+
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F('followers_count') + 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    """Уменьшает счетчик подписчиков автора."""
+
+    User.objects.filter(pk=instance.author_id, followers_count__gt=0).update(
+        followers_count=F('followers_count') - 1)
+
+
+@receiver(m2m_changed, sender=Subscription)
+def update_followers_count(sender, action, pk_set, **kwargs):
+    """Изменяет счетчики подписчиков пачки авторов, подписки на которых
+       созданы или удалены одним запросом, одним обновлением."""
+
+    authors = User.objects.filter(pk__in=pk_set)
+    if action == 'post_add':
+        authors.update(followers_count=F('followers_count') + 1)
+    elif action == 'post_remove':
+        authors.filter(followers_count__gt=0).update(
+            followers_count=F('followers_count') - 1)